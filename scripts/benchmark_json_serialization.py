@@ -0,0 +1,58 @@
+"""Compare JSON backends on enriched AMs: output bytes of each backend against json, and timings
+for loading and for dumping AMs in both formats (enriched AMs and AM repository).
+"""
+
+import argparse
+import json
+import os
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+from tasks.common.fast_json import JSON_BACKENDS, JSONBackend
+from tasks.data_build.filenames import ENRICHED_OUTPUT_FOLDER
+from tasks.data_build.utils import typed_tqdm
+
+_FORMATS = {'enriched': (False, False), 'repository': (True, True)}  # (ensure_ascii, sort_keys)
+
+
+def _load_raw_ams(max_nb_ams: int) -> List[bytes]:
+    raw_ams = []
+    for filename in sorted(os.listdir(ENRICHED_OUTPUT_FOLDER))[:max_nb_ams]:
+        with open(os.path.join(ENRICHED_OUTPUT_FOLDER, filename), 'rb') as file_:
+            raw_ams.append(file_.read())
+    return raw_ams
+
+
+def _time(function: Callable[[Any], Any], inputs: List[Any]) -> float:
+    start = perf_counter()
+    for input_ in inputs:
+        function(input_)
+    return perf_counter() - start
+
+
+def _nb_differing_outputs(backend: JSONBackend, ams: List[Dict], ensure_ascii: bool, sort_keys: bool) -> int:
+    expected = [json.dumps(am, ensure_ascii=ensure_ascii, indent=2, sort_keys=sort_keys) for am in ams]
+    return sum(backend.dumps(am, ensure_ascii, sort_keys) != output for am, output in zip(ams, expected))
+
+
+def _benchmark(backend: JSONBackend, raw_ams: List[bytes], ams: List[Dict]) -> None:
+    print(f'Backend {backend.name}:')
+    print(f'\tloads: {_time(backend.loads, raw_ams):.2f}s')
+    for format_, (ensure_ascii, sort_keys) in _FORMATS.items():
+        duration = _time(lambda am: backend.dumps(am, ensure_ascii, sort_keys), ams)
+        nb_differences = _nb_differing_outputs(backend, ams, ensure_ascii, sort_keys)
+        print(f'\tdumps ({format_}): {duration:.2f}s, {nb_differences}/{len(ams)} outputs differ from json')
+
+
+def run(max_nb_ams: int) -> None:
+    raw_ams = _load_raw_ams(max_nb_ams)
+    ams = [json.loads(raw_am) for raw_am in typed_tqdm(raw_ams, 'Parsing AMs')]
+    print(f'{len(ams)} AMs, {sum(map(len, raw_ams)) / 1e6:.1f} MB.')
+    for backend in JSON_BACKENDS.values():
+        _benchmark(backend, raw_ams, ams)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--max-nb-ams', type=int, default=10_000, help='Number of AMs to benchmark on')
+    run(parser.parse_args().max_nb_ams)
@@ -0,0 +1,199 @@
+"""Benchmark the regulation engine on seeded samples of installations, as envinorma-web would run it.
+
+Each installation goes through three phases, timed separately: match (applicable AMs from the
+AM index), fetch (AMs and parametrizations from the database) and apply (parameter values
+applied to the AMs). Each sample is run cold, with an empty applied AM cache, then warm, with
+the cache filled by the cold run. Latency percentiles are written as JSON and can be compared
+to a baseline written by a previous run. The throughput of the batch API on the whole sample
+is measured as well.
+
+Samples are stored as CSV fixtures on first run, so later runs only need the database of
+DATA_FETCHER.psql_dsn, which can be a local restore of a backup (make init-db-from-backup).
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+from collections import Counter
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from envinorma.models import DetailedClassement
+
+from tasks.data_build.config import SEED_FOLDER
+from tasks.data_build.filenames import Dataset
+from tasks.data_build.load import load_am_inputs, load_am_metadata, load_classements_csv, load_classements_from_csv
+from tasks.data_build.utils import typed_tqdm
+from tasks.regulation_engine.am_index import AMIndex
+from tasks.regulation_engine.applied_am_cache import AppliedAMCache
+from tasks.regulation_engine.batch import evaluate_installations
+from tasks.regulation_engine.parameters import known_parameter_dict
+
+_PHASES = ('match', 'fetch', 'apply', 'total')
+_PERCENTILES = (50, 95, 99)
+_DEFAULT_FIXTURES_FOLDER = os.path.join(SEED_FOLDER, 'benchmark_fixtures')
+
+_Installation = Tuple[str, List[DetailedClassement]]
+
+
+def _sample_fixture(dataset: Dataset, sample_size: int, seed: int, fixtures_folder: str) -> str:
+    filename = os.path.join(fixtures_folder, f'classements_{dataset}_{sample_size}_{seed}.csv')
+    if not os.path.exists(filename):
+        classements = load_classements_csv(dataset)
+        installation_ids = sorted(set(classements.s3ic_id))
+        sample = random.Random(seed).sample(installation_ids, min(sample_size, len(installation_ids)))
+        os.makedirs(fixtures_folder, exist_ok=True)
+        classements[classements.s3ic_id.isin(sample)].to_csv(filename, index=False)
+    return filename
+
+
+def _load_sample(dataset: Dataset, sample_size: int, seed: int, fixtures_folder: str) -> List[_Installation]:
+    groups: Dict[str, List[DetailedClassement]] = {}
+    for classement in load_classements_from_csv(_sample_fixture(dataset, sample_size, seed, fixtures_folder)):
+        groups.setdefault(classement.s3ic_id, []).append(classement)
+    return sorted(groups.items())
+
+
+def _run_installation(
+    classements: List[DetailedClassement], am_index: AMIndex, cache: AppliedAMCache
+) -> Dict[str, float]:
+    start = perf_counter()
+    am_to_classements = am_index.group_by_am_id(classements)
+    matched = perf_counter()
+    am_inputs = load_am_inputs(set(am_to_classements))
+    fetched = perf_counter()
+    for am_id, am_classements in am_to_classements.items():
+        inputs = am_inputs[am_id]
+        cache.apply(am_id, inputs.am, inputs.parametrization, known_parameter_dict(am_classements))
+    applied = perf_counter()
+    return {'match': matched - start, 'fetch': fetched - matched, 'apply': applied - fetched, 'total': applied - start}
+
+
+def _statistics(durations: List[float]) -> Dict[str, float]:
+    if not durations:
+        return {}
+    quantiles = statistics.quantiles(durations, n=100, method='inclusive') if len(durations) > 1 else durations * 99
+    return {
+        **{f'p{percentile}': quantiles[percentile - 1] for percentile in _PERCENTILES},
+        'mean': statistics.mean(durations),
+        'max': max(durations),
+    }
+
+
+def _hit_rate(nb_hits: int, nb_misses: int) -> float:
+    return nb_hits / (nb_hits + nb_misses) if nb_hits + nb_misses else 0.0
+
+
+def _run(installations: List[_Installation], am_index: AMIndex, cache: AppliedAMCache, name: str) -> Dict[str, Any]:
+    durations: Dict[str, List[float]] = {phase: [] for phase in _PHASES}
+    errors: Counter[str] = Counter()
+    nb_hits, nb_misses = cache.nb_hits, cache.nb_misses
+    for _, classements in typed_tqdm(installations, name, leave=False):
+        try:
+            phase_durations = _run_installation(classements, am_index, cache)
+        except Exception as exc:  # Errors are reported, their installations are excluded from latencies
+            errors[f'{type(exc).__name__}: {exc}'[:200]] += 1
+            continue
+        for phase, duration in phase_durations.items():
+            durations[phase].append(duration)
+    return {
+        'nb_installations': len(installations),
+        'nb_errors': sum(errors.values()),
+        'errors': dict(errors.most_common(10)),
+        'cache_hit_rate': _hit_rate(cache.nb_hits - nb_hits, cache.nb_misses - nb_misses),
+        'phases': {phase: _statistics(phase_durations) for phase, phase_durations in durations.items()},
+    }
+
+
+def _run_batch(installations: List[_Installation], am_index: AMIndex) -> Dict[str, Any]:
+    start = perf_counter()
+    result = evaluate_installations((classement for _, group in installations for classement in group), am_index)
+    duration = perf_counter() - start
+    return {
+        'nb_installations': len(installations),
+        'nb_errors': len(result.errors),
+        'duration': duration,
+        'installations_per_second': len(installations) / duration,
+    }
+
+
+def _print_run(name: str, result: Dict[str, Any]) -> None:
+    print(f'{name}: {result["nb_errors"]}/{result["nb_installations"]} errors, ', end='')
+    print(f'cache hit rate {result["cache_hit_rate"]:.1%}')
+    for phase, phase_statistics in result['phases'].items():
+        durations = ' '.join(f'{key}={value * 1000:.1f}ms' for key, value in phase_statistics.items())
+        print(f'\t{phase.ljust(6)}{durations}')
+
+
+def _compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    regressions = []
+    for name, result in results['runs'].items():
+        for phase, phase_statistics in result['phases'].items():
+            baseline_statistics = baseline['runs'].get(name, {}).get('phases', {}).get(phase, {})
+            for key in (f'p{percentile}' for percentile in _PERCENTILES):
+                value, reference = phase_statistics.get(key), baseline_statistics.get(key)
+                if not value or not reference:
+                    continue
+                ratio = value / reference
+                print(f'{name} {phase} {key}: {reference * 1000:.1f}ms -> {value * 1000:.1f}ms ({ratio - 1:+.0%})')
+                if ratio > 1 + max_regression:
+                    regressions.append(f'{name} {phase} {key}')
+    return regressions
+
+
+def run(
+    datasets: List[Dataset],
+    sample_size: int,
+    seed: int,
+    fixtures_folder: str,
+    output: Optional[str],
+    baseline: Optional[str],
+    max_regression: float,
+) -> int:
+    am_index = AMIndex(load_am_metadata())  # Built once, as envinorma-web would at startup
+    results: Dict[str, Any] = {'config': {'sample_size': sample_size, 'seed': seed}, 'runs': {}, 'batch': {}}
+    for dataset in datasets:
+        installations = _load_sample(dataset, sample_size, seed, fixtures_folder)
+        cache = AppliedAMCache()
+        for temperature in ('cold', 'warm'):  # Warm run reuses the cache filled by the cold run
+            name = f'{dataset}/{temperature}'
+            results['runs'][name] = _run(installations, am_index, cache, name)
+            _print_run(name, results['runs'][name])
+        results['batch'][dataset] = _run_batch(installations, am_index)
+        print(f'{dataset}/batch: {results["batch"][dataset]["installations_per_second"]:.0f} installations/s')
+    if output:
+        with open(output, 'w') as file_:
+            json.dump(results, file_, indent=2, sort_keys=True)
+    if not baseline:
+        return 0
+    with open(baseline) as file_:
+        regressions = _compare(results, json.load(file_), max_regression)
+    if regressions:
+        print(f'Regressions above {max_regression:.0%}: {", ".join(regressions)}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', nargs='+', default=['sample', 'all'], choices=['sample', 'idf', 'all'])
+    parser.add_argument('--sample-size', type=int, default=1_000, help='Number of installations per dataset')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fixtures-folder', default=_DEFAULT_FIXTURES_FOLDER)
+    parser.add_argument('--output', help='JSON file to write results to')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare to')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Tolerated latency increase, 0.2 for 20%%')
+    args = parser.parse_args()
+    sys.exit(
+        run(
+            args.datasets,
+            args.sample_size,
+            args.seed,
+            args.fixtures_folder,
+            args.output,
+            args.baseline,
+            args.max_regression,
+        )
+    )
@@ -1,16 +1,24 @@
-# Check that all parameters cannot be satisfied simultaneously.
+# Check that alternative sections of a same section cannot be applicable simultaneously.
+# Exits with status 1 if any section has conflicting alternative sections, to be used as a CI gate.
+import argparse
+import sys
 
-from tasks.data_build.config import DATA_FETCHER
+from tasks.data_build.validate.check_parametrizations import check_parametrizations, dump_report
 
 
-def run() -> None:
-    res = DATA_FETCHER.build_enriched_ams()
-
-    for am in res:
-        for sec in am.descendent_sections():
-            if not sec.parametrization_elements_are_compatible():
-                print(am.id, sec.title.text)
+def run(output: str) -> int:
+    report = check_parametrizations()
+    for conflict in report.conflicts:
+        print(conflict.am_id, ' > '.join(conflict.section_path) or conflict.section_id, conflict.conditions)
+    for am_id, error in report.errors.items():
+        print(am_id, error)
+    if output:
+        dump_report(report, output)
+    print(f'{len(report.conflicts)} conflicts and {len(report.errors)} errors in {report.nb_ams} AMs.')
+    return 1 if report.conflicts or report.errors else 0
 
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', help='JSON file to write the report to')
+    sys.exit(run(parser.parse_args().output))
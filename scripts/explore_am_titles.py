@@ -9,7 +9,7 @@ from typing import Dict, List, Optional, Union
 from envinorma.models.arrete_ministeriel import ArreteMinisteriel
 from envinorma.models.structured_text import StructuredText
 
-from tasks.data_build.load import load_ams
+from tasks.data_build.load import load_ams_from_store
 
 _Section = Union[StructuredText, ArreteMinisteriel]
 
@@ -63,7 +63,7 @@ def _print_all_matching_depths(ams: List[ArreteMinisteriel], target_depth: int)
 
 
 if __name__ == '__main__':
-    _AMS = list(load_ams().values())
+    _AMS = list(load_ams_from_store().values())
     am = random.choice(_AMS)
     _print_titles(am, 2)
 
@@ -7,7 +7,7 @@ from envinorma.models.arrete_ministeriel import ArreteMinisteriel
 from envinorma.models.structured_text import StructuredText
 from envinorma.models.text_elements import Table
 
-from tasks.data_build.load import load_ams
+from tasks.data_build.load import load_ams_from_store
 
 _Section = Union[StructuredText, ArreteMinisteriel]
 
@@ -36,6 +36,6 @@ def _extract_table_max_rowspan_counter(ams: List[ArreteMinisteriel]) -> Dict[int
 
 
 if __name__ == '__main__':
-    _AMS = list(load_ams().values())
+    _AMS = list(load_ams_from_store().values())
     _extract_table_lengths_counter(_AMS)
     _extract_table_max_rowspan_counter(_AMS)
@@ -1,28 +1,36 @@
 """Generate very simple topics for AMs. -- One shot script."""
-import json
 import os
 from typing import Dict
 
 from envinorma.models.arrete_ministeriel import ArreteMinisteriel
 from envinorma.topics.simple_topics import add_simple_topics
-from envinorma.utils import typed_tqdm, write_json
+from envinorma.utils import typed_tqdm
 
+from tasks.common import fast_json
 from tasks.common.config import DATA_FETCHER
+from tasks.data_build.build.build_ams import serialize_enriched_am
+from tasks.data_build.build.enriched_ams import replace_enriched_ams
 from tasks.data_build.filenames import ENRICHED_OUTPUT_FOLDER
 from tasks.data_build.validate.check_am import check_ams
 
 
+def _load_enriched_am(filename: str) -> ArreteMinisteriel:
+    with open(filename, 'rb') as file_:
+        return ArreteMinisteriel.from_dict(fast_json.loads(file_.read()))
+
+
 def _load_enriched_am_list(enriched_output_folder: str) -> Dict[str, ArreteMinisteriel]:
-    return {
-        file_: ArreteMinisteriel.from_dict(json.load(open(os.path.join(enriched_output_folder, file_))))
-        for file_ in os.listdir(enriched_output_folder)
-    }
+    filenames = os.listdir(enriched_output_folder)
+    return {file_: _load_enriched_am(os.path.join(enriched_output_folder, file_)) for file_ in filenames}
 
 
 def _add_simple_topics():
     file_to_am = _load_enriched_am_list(ENRICHED_OUTPUT_FOLDER)
-    for file_, am in typed_tqdm(file_to_am.items(), 'Adding topics'):
-        write_json(add_simple_topics(am).to_dict(), os.path.join(ENRICHED_OUTPUT_FOLDER, file_))
+    serialized_ams = {
+        am.id: serialize_enriched_am(add_simple_topics(am).to_dict())
+        for am in typed_tqdm(file_to_am.values(), 'Adding topics')
+    }
+    replace_enriched_ams(serialized_ams)
 
 
 def _add_simple_topics_in_am_db():
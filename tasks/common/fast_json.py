@@ -0,0 +1,105 @@
+'''
+Pluggable JSON backend for (de)serializing AMs.
+
+orjson is used when installed, unless the JSON_BACKEND environment variable is set to 'json'.
+Its output is post-processed to be byte-identical to json.dumps(..., indent=2): non-ASCII
+characters are escaped when ensure_ascii is True, and output containing floats in exponent
+notation, which both libraries format differently, is produced by the standard library.
+Likewise, content with integers too large for orjson is loaded by the standard library.
+orjson writes NaN and infinite floats as null, so output containing null is produced by the
+standard library when the object contains such floats.
+'''
+import json
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+_NON_ASCII = re.compile(r'[^\x00-\x7e]')  # json also escapes DEL when ensure_ascii is True
+_EXPONENT_FLOAT = re.compile(r'[0-9]e[-+]?[0-9]')
+_LONG_NUMBER = re.compile(r'[0-9]{19}')
+_LONG_NUMBER_BYTES = re.compile(rb'[0-9]{19}')
+
+
+@dataclass
+class JSONBackend:
+    name: str
+    dumps: Callable[[Any, bool, bool], str]  # (object_, ensure_ascii, sort_keys) -> JSON indented with 2 spaces
+    loads: Callable[[Union[str, bytes]], Any]
+
+
+def _json_dumps(object_: Any, ensure_ascii: bool, sort_keys: bool) -> str:
+    return json.dumps(object_, ensure_ascii=ensure_ascii, indent=2, sort_keys=sort_keys)
+
+
+def _escape_non_ascii(match: 're.Match[str]') -> str:
+    code_point = ord(match.group())
+    if code_point <= 0xFFFF:
+        return f'\\u{code_point:04x}'
+    high, low = divmod(code_point - 0x10000, 0x400)
+    return f'\\u{0xD800 + high:04x}\\u{0xDC00 + low:04x}'
+
+
+def _has_non_finite_float(object_: Any) -> bool:
+    if isinstance(object_, float):
+        return not math.isfinite(object_)
+    if isinstance(object_, dict):
+        return any(_has_non_finite_float(value) for value in object_.values())
+    if isinstance(object_, (list, tuple)):
+        return any(_has_non_finite_float(value) for value in object_)
+    return False
+
+
+def _orjson_dumps(object_: Any, ensure_ascii: bool, sort_keys: bool) -> str:
+    option = orjson.OPT_INDENT_2 | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    try:
+        result = orjson.dumps(object_, option=option).decode()
+    except TypeError:  # Integers above 64 bits, non string keys, etc.
+        return _json_dumps(object_, ensure_ascii, sort_keys)
+    if _EXPONENT_FLOAT.search(result):  # Might be a float, or only a string, fallback in both cases
+        return _json_dumps(object_, ensure_ascii, sort_keys)
+    if 'null' in result and _has_non_finite_float(object_):  # Written as NaN, Infinity or -Infinity by json
+        return _json_dumps(object_, ensure_ascii, sort_keys)
+    return _NON_ASCII.sub(_escape_non_ascii, result) if ensure_ascii else result
+
+
+def _orjson_loads(content: Union[str, bytes]) -> Any:
+    long_number = _LONG_NUMBER_BYTES.search(content) if isinstance(content, bytes) else _LONG_NUMBER.search(content)
+    if long_number:  # orjson loads integers above 64 bits as floats
+        return json.loads(content)
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:  # NaN and Infinity are accepted by json only
+        return json.loads(content)
+
+
+JSON_BACKENDS: Dict[str, JSONBackend] = {'json': JSONBackend('json', _json_dumps, json.loads)}
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = JSONBackend('orjson', _orjson_dumps, _orjson_loads)
+
+
+def _default_backend() -> JSONBackend:
+    name: Optional[str] = os.environ.get('JSON_BACKEND')
+    if name is not None:
+        if name not in JSON_BACKENDS:
+            raise ValueError(f'Unknown JSON_BACKEND {name}, expecting one of {sorted(JSON_BACKENDS)}.')
+        return JSON_BACKENDS[name]
+    return JSON_BACKENDS.get('orjson') or JSON_BACKENDS['json']
+
+
+BACKEND = _default_backend()
+
+
+def dumps(object_: Any, ensure_ascii: bool = True, sort_keys: bool = False) -> str:
+    """Serialize object_ exactly as json.dumps(object_, ensure_ascii=ensure_ascii, indent=2, sort_keys=sort_keys)."""
+    return BACKEND.dumps(object_, ensure_ascii, sort_keys)
+
+
+def loads(content: Union[str, bytes]) -> Any:
+    return BACKEND.loads(content)
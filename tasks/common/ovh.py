@@ -1,6 +1,6 @@
 import tempfile
 from functools import lru_cache
-from typing import Any, Callable, Dict, Iterable, List, Literal, TypeVar
+from typing import IO, Any, Callable, Dict, Iterable, List, Literal, TypeVar
 
 from swiftclient.service import SwiftService, SwiftUploadObject
 
@@ -71,6 +71,13 @@ class OVHClient:
         result = list(_get_swift_service().upload(bucket_name, [remote]))
         _check_upload(result)
 
+    @staticmethod
+    def upload_stream(bucket_name: BucketName, stream: IO[bytes], destination: str) -> None:
+        """Upload the content of a stream, read until its end, without storing it locally."""
+        remote = SwiftUploadObject(stream, object_name=destination)
+        result = list(_get_swift_service().upload(bucket_name, [remote]))
+        _check_upload(result)
+
     @staticmethod
     def list_bucket_objects(bucket_name: BucketName) -> Iterable[Dict[str, Any]]:
         return _get_swift_service().list(bucket_name)
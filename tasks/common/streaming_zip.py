@@ -0,0 +1,138 @@
+'''
+Zip writer for non-seekable streams, compressing entries in parallel.
+
+Each file is deflated in a thread pool (zlib releases the GIL), so its CRC and sizes are
+known before its local header is written: the archive is written sequentially, without
+seeking nor data descriptors, and can be piped directly into an upload.
+Zip64 is not supported, archives must stay under 4 GB and 65535 entries.
+'''
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Deque, List, Optional, Tuple
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_OF_CENTRAL_DIRECTORY = struct.Struct('<IHHHHIIH')
+_LOCAL_HEADER_SIGNATURE = 0x04034B50
+_CENTRAL_HEADER_SIGNATURE = 0x02014B50
+_END_OF_CENTRAL_DIRECTORY_SIGNATURE = 0x06054B50
+_VERSION = 20
+_MADE_BY_UNIX = 3 << 8 | _VERSION
+_UTF8_FLAG = 1 << 11
+_DEFLATED = 8
+_FILE_ATTRIBUTES = 0o100644 << 16
+_MAX_SIZE = 0xFFFFFFFF
+_MAX_ENTRIES = 0xFFFF
+_NB_PENDING_ENTRIES_PER_WORKER = 4
+
+
+@dataclass
+class CompressedEntry:
+    name: str
+    crc: int
+    size: int
+    compressed_data: bytes
+    dos_time: int
+    dos_date: int
+
+
+def _dos_time_and_date(timestamp: float) -> Tuple[int, int]:
+    year, month, day, hour, minute, second, *_ = time.localtime(timestamp)
+    year = max(year, 1980)
+    return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+
+def compress_file(filename: str, name: str, level: int = zlib.Z_DEFAULT_COMPRESSION) -> CompressedEntry:
+    with open(filename, 'rb') as file_:
+        data = file_.read()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)  # raw deflate, as expected in zip files
+    compressed_data = compressor.compress(data) + compressor.flush()
+    dos_time, dos_date = _dos_time_and_date(os.path.getmtime(filename))
+    return CompressedEntry(name, zlib.crc32(data), len(data), compressed_data, dos_time, dos_date)
+
+
+class StreamingZipWriter:
+    def __init__(self, stream: BinaryIO) -> None:
+        self._stream = stream
+        self._offset = 0
+        self._central_headers: List[bytes] = []
+
+    def _write(self, data: bytes) -> None:
+        self._stream.write(data)
+        self._offset += len(data)
+
+    def write_entry(self, entry: CompressedEntry) -> None:
+        if max(self._offset, entry.size, len(entry.compressed_data)) > _MAX_SIZE:
+            raise ValueError(f'Archive is too large to add {entry.name}, zip64 is not supported.')
+        if len(self._central_headers) >= _MAX_ENTRIES:
+            raise ValueError(f'Archive has too many entries to add {entry.name}, zip64 is not supported.')
+        name = entry.name.encode()
+        common = (entry.dos_time, entry.dos_date, entry.crc, len(entry.compressed_data), entry.size, len(name))
+        central_header = _CENTRAL_HEADER.pack(
+            _CENTRAL_HEADER_SIGNATURE,
+            _MADE_BY_UNIX,
+            _VERSION,
+            _UTF8_FLAG,
+            _DEFLATED,
+            *common,
+            0,  # extra field length
+            0,  # comment length
+            0,  # disk number
+            0,  # internal attributes
+            _FILE_ATTRIBUTES,
+            self._offset,
+        )
+        self._central_headers.append(central_header + name)
+        self._write(_LOCAL_HEADER.pack(_LOCAL_HEADER_SIGNATURE, _VERSION, _UTF8_FLAG, _DEFLATED, *common, 0) + name)
+        self._write(entry.compressed_data)
+
+    def close(self) -> None:
+        central_directory_offset = self._offset
+        for central_header in self._central_headers:
+            self._write(central_header)
+        if self._offset > _MAX_SIZE:
+            raise ValueError('Archive is too large, zip64 is not supported.')
+        nb_entries = len(self._central_headers)
+        central_directory_size = self._offset - central_directory_offset
+        self._write(
+            _END_OF_CENTRAL_DIRECTORY.pack(
+                _END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+                0,
+                0,
+                nb_entries,
+                nb_entries,
+                central_directory_size,
+                central_directory_offset,
+                0,
+            )
+        )
+        self._stream.flush()
+
+
+def write_zip(stream: BinaryIO, files: List[Tuple[str, str]], max_workers: Optional[int] = None) -> None:
+    """Write a zip archive of files in a stream, compressing files in parallel.
+
+    Files are compressed ahead of writing by at most a few entries per worker, so that
+    memory usage does not depend on the size of the archive.
+
+    Args:
+        stream (BinaryIO): writable binary stream, which does not need to be seekable.
+        files (List[Tuple[str, str]]): list of (filename on disk, name in archive).
+        max_workers (Optional[int], optional): number of compression threads. Defaults to ThreadPoolExecutor's default.
+    """
+    writer = StreamingZipWriter(stream)
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    pending: Deque['Future[CompressedEntry]'] = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for filename, name in files:
+            pending.append(executor.submit(compress_file, filename, name))
+            if len(pending) >= max_workers * _NB_PENDING_ENTRIES_PER_WORKER:
+                writer.write_entry(pending.popleft().result())
+        while pending:
+            writer.write_entry(pending.popleft().result())
+    writer.close()
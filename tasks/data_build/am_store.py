@@ -0,0 +1,134 @@
+'''
+Single-file store of enriched AMs, with random access by AM id.
+
+Layout: a magic header, then one zlib-compressed serialized AM per id, then the compressed
+index mapping AM id to the (offset, length) of its blob, then a fixed size footer giving the
+offset and length of the index. The file is memory-mapped when read, so loading one AM only
+reads and decompresses its own blob.
+
+The parametrizations the stored AMs were enriched with are written in a JSON file next to the
+store, so that stored AMs can be checked against them without querying the database.
+'''
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterator, List, Set, Tuple
+
+from envinorma.models import ArreteMinisteriel
+from envinorma.parametrization import Parametrization
+
+from tasks.common import fast_json
+
+_MAGIC = b'AMSTORE1'
+_FOOTER = struct.Struct(f'<QQ{len(_MAGIC)}s')
+_COMPRESSION_LEVEL = 6
+
+
+class AMStore:
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        with open(filename, 'rb') as file_:
+            self._mmap = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(_MAGIC)] != _MAGIC:
+            raise ValueError(f'{filename} is not an AM store.')
+        index_offset, index_length, magic = _FOOTER.unpack(self._mmap[-_FOOTER.size :])
+        if magic != _MAGIC:
+            raise ValueError(f'{filename} is truncated.')
+        index = fast_json.loads(zlib.decompress(self._mmap[index_offset : index_offset + index_length]))
+        self._index: Dict[str, Tuple[int, int]] = {am_id: (offset, length) for am_id, (offset, length) in index.items()}
+
+    def __enter__(self) -> 'AMStore':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def ids(self) -> Set[str]:
+        return set(self._index)
+
+    def raw_blob(self, am_id: str) -> bytes:
+        offset, length = self._index[am_id]
+        return self._mmap[offset : offset + length]
+
+    def load_serialized(self, am_id: str) -> bytes:
+        return zlib.decompress(self.raw_blob(am_id))
+
+    def load(self, am_id: str) -> ArreteMinisteriel:
+        return ArreteMinisteriel.from_dict(fast_json.loads(self.load_serialized(am_id)))
+
+    def items(self) -> Iterator[Tuple[str, ArreteMinisteriel]]:
+        """Iterate over all AMs in file order, for sequential reads."""
+        for am_id, _ in sorted(self._index.items(), key=lambda item: item[1][0]):
+            yield am_id, self.load(am_id)
+
+
+def _write_store(filename: str, blobs: Iterator[Tuple[str, bytes]]) -> None:
+    temporary_filename = filename + '.tmp'
+    index: Dict[str, List[int]] = {}
+    with open(temporary_filename, 'wb') as file_:
+        file_.write(_MAGIC)
+        offset = len(_MAGIC)
+        for am_id, blob in blobs:
+            file_.write(blob)
+            index[am_id] = [offset, len(blob)]
+            offset += len(blob)
+        compressed_index = zlib.compress(fast_json.dumps(index, sort_keys=True).encode())
+        file_.write(compressed_index)
+        file_.write(_FOOTER.pack(offset, len(compressed_index), _MAGIC))
+    os.replace(temporary_filename, filename)  # Readers keep their mmap of the previous file
+
+
+def _compress(serialized_am: str) -> bytes:
+    return zlib.compress(serialized_am.encode(), _COMPRESSION_LEVEL)
+
+
+def write_am_store(serialized_ams: Dict[str, str], filename: str) -> None:
+    """Write a store containing the given serialized AMs, replacing any existing store atomically.
+
+    Args:
+        serialized_ams (Dict[str, str]): dict mapping AM id to the serialized AM.
+        filename (str): store filename.
+    """
+    _write_store(filename, ((am_id, _compress(serialized_ams[am_id])) for am_id in sorted(serialized_ams)))
+
+
+def update_am_store(serialized_ams: Dict[str, str], removed_am_ids: Set[str], filename: str) -> None:
+    """Rewrite a store with the given AMs added or replaced and removed AMs deleted.
+
+    Blobs of unchanged AMs are copied as is, without being decompressed.
+
+    Args:
+        serialized_ams (Dict[str, str]): dict mapping AM id to the serialized AM, for new and changed AMs.
+        removed_am_ids (Set[str]): ids of the AMs to delete.
+        filename (str): store filename.
+    """
+    with AMStore(filename) as previous:
+        am_ids = sorted((previous.ids() - removed_am_ids) | set(serialized_ams))
+        blobs = (
+            (am_id, _compress(serialized_ams[am_id]) if am_id in serialized_ams else previous.raw_blob(am_id))
+            for am_id in am_ids
+        )
+        _write_store(filename, blobs)
+
+
+def write_parametrizations(parametrizations: Dict[str, Parametrization], filename: str) -> None:
+    """Write the parametrizations of the stored AMs, replacing any existing file atomically.
+
+    Args:
+        parametrizations (Dict[str, Parametrization]): dict mapping AM id to its parametrization.
+        filename (str): parametrizations filename.
+    """
+    content = {am_id: parametrizations[am_id].to_dict() for am_id in sorted(parametrizations)}
+    with open(filename + '.tmp', 'w') as file_:
+        file_.write(fast_json.dumps(content))
+    os.replace(filename + '.tmp', filename)
+
+
+def load_parametrizations(filename: str) -> Dict[str, Parametrization]:
+    with open(filename, 'rb') as file_:
+        content = fast_json.loads(file_.read())
+    return {am_id: Parametrization.from_dict(parametrization) for am_id, parametrization in content.items()}
@@ -0,0 +1,91 @@
+'''
+Count the classements of all installations to which each AM applies, in total and per region.
+
+Classements are counted by (rubrique, regime, alinea, region), then joined with the classements of
+AM metadata: an AM classement without alinea matches every alinea of its rubrique and regime.
+'''
+import json
+from typing import Dict
+
+import pandas
+from envinorma.models import AMMetadata, DetailedRegime
+
+from tasks.common.ovh import dump_in_ovh
+from tasks.data_build.filenames import dataset_object_name
+from tasks.data_build.load import load_am_metadata, load_classements_csv, load_installations_csv
+
+_SIMPLE_REGIMES = {regime.value: regime.to_simple_regime() for regime in DetailedRegime}
+_KEY = ['rubrique', 'regime']
+
+
+def _am_classements(metadata: Dict[str, AMMetadata]) -> pandas.DataFrame:
+    rows = {
+        (am_id, classement.rubrique, classement.regime.value, classement.alinea or None)
+        for am_id, md in metadata.items()
+        for classement in md.classements
+    }
+    am_classements = pandas.DataFrame(sorted(rows, key=str), columns=['am_id', *_KEY, 'alinea'])
+    wildcards = am_classements[am_classements.alinea.isna()]
+    # Alinea specific classements of an AM already matching all alineas would be counted twice
+    covered = am_classements.merge(wildcards[['am_id', *_KEY]], how='left', on=['am_id', *_KEY], indicator=True)
+    return covered[covered.alinea.isna() | (covered._merge == 'left_only')].drop(columns='_merge')
+
+
+def _classement_counts(classements: pandas.DataFrame, installations: pandas.DataFrame) -> pandas.DataFrame:
+    classements = classements[['s3ic_id', 'rubrique', 'regime', 'alinea']].merge(
+        installations[['s3ic_id', 'region']], how='left', on='s3ic_id'
+    )
+    classements['regime'] = classements.regime.map(_SIMPLE_REGIMES)
+    classements['region'] = classements.region.fillna('')
+    columns = [*_KEY, 'alinea', 'region']
+    return classements.groupby(columns, dropna=False).size().rename('nb_classements').reset_index()
+
+
+def compute_am_occurrences(
+    classements: pandas.DataFrame, installations: pandas.DataFrame, metadata: Dict[str, AMMetadata]
+) -> pandas.DataFrame:
+    """Count the classements matched by each AM, per region.
+
+    Args:
+        classements (pandas.DataFrame): classements dataset, with s3ic_id, rubrique, regime and alinea columns.
+        installations (pandas.DataFrame): installations dataset, with s3ic_id and region columns.
+        metadata (Dict[str, AMMetadata]): metadata of the AMs, by AM id.
+
+    Returns:
+        pandas.DataFrame: am_id, region and nb_classements columns, for AMs matching at least one classement.
+    """
+    counts = _classement_counts(classements, installations)
+    am_classements = _am_classements(metadata)
+    wildcard_matches = am_classements[am_classements.alinea.isna()].drop(columns='alinea').merge(counts, on=_KEY)
+    alinea_matches = am_classements.dropna(subset=['alinea']).merge(counts, on=[*_KEY, 'alinea'])
+    matches = pandas.concat([wildcard_matches, alinea_matches], ignore_index=True)
+    return matches.groupby(['am_id', 'region'], as_index=False).nb_classements.sum()
+
+
+def _dump_json(content: Dict[str, int], filename: str) -> None:
+    with open(filename, 'w') as file_:
+        json.dump(content, file_, indent=2, sort_keys=True)
+
+
+def build_am_occurrences() -> Dict[str, int]:
+    """Compute and upload the am_id_to_nb_classements dataset and its breakdown per region.
+
+    Returns:
+        Dict[str, int]: number of classements of all installations to which each AM applies.
+    """
+    metadata = load_am_metadata()
+    occurrences = compute_am_occurrences(load_classements_csv('all'), load_installations_csv('all'), metadata)
+    totals = occurrences.groupby('am_id').nb_classements.sum()
+    am_id_to_nb_classements = {am_id: int(totals.get(am_id, 0)) for am_id in metadata}
+    dump_in_ovh(
+        dataset_object_name('all', 'am_id_to_nb_classements', 'json'),
+        'misc',
+        lambda filename: _dump_json(am_id_to_nb_classements, filename),
+    )
+    dump_in_ovh(
+        dataset_object_name('all', 'am_id_to_nb_classements_by_region'),
+        'misc',
+        lambda filename: occurrences.to_csv(filename, index=False),
+    )
+    print(f'{len(occurrences)} (AM, region) pairs, {sum(am_id_to_nb_classements.values())} matched classements.')
+    return am_id_to_nb_classements
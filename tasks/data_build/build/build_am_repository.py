@@ -2,65 +2,80 @@
 Generate AM open data repository
 cf https://github.com/Envinorma/arretes-ministeriels
 '''
-import json
 import os
-from typing import Any, Dict, List, Union
+from contextlib import contextmanager, suppress
+from typing import Dict, Iterator, List, Set, Tuple, Union
 
-from envinorma.models.arrete_ministeriel import ArreteMinisteriel
+from envinorma.models import AMMetadata
 from envinorma.utils import typed_tqdm
 
-from tasks.data_build.config import AM_REPOSITORY_FOLDER, DATA_FETCHER
+from tasks.common import fast_json
+from tasks.data_build.config import AM_REPOSITORY_FOLDER
+from tasks.data_build.utils import staged_folder
 
 _METADATA_FOLDER = os.path.join(AM_REPOSITORY_FOLDER, 'metadata')
 _AMS_FOLDER = os.path.join(AM_REPOSITORY_FOLDER, 'ams')
+_STAGING_FOLDER = AM_REPOSITORY_FOLDER.rstrip('/') + '_staging'
 
 
-def _create_if_inexistent(folder: str) -> None:
-    if not os.path.exists(folder):
-        os.mkdir(folder)
+def serialize_repository_am(object_: Union[Dict, List]) -> str:
+    return fast_json.dumps(object_, ensure_ascii=True, sort_keys=True)
 
 
-def _dump(object_: Union[Dict, List], filename: str) -> None:
+def _dump(serialized_object: str, filename: str) -> None:
     with open(filename, 'w') as file_:
-        json.dump(object_, file_, ensure_ascii=True, indent=2, sort_keys=True)
+        file_.write(serialized_object)
 
 
-def _dump_am_metadata(am_id: str, am: Dict[str, Any]) -> None:
-    filename = os.path.join(_METADATA_FOLDER, am_id + '.json')
-    _dump(am, filename)
+def _generate_metadata_folder(metadata: Dict[str, AMMetadata], folder: str) -> None:
+    for am_id, md in typed_tqdm(metadata.items(), 'Dumping AM metadata'):
+        _dump(serialize_repository_am(md.to_dict()), os.path.join(folder, am_id + '.json'))
 
 
-def _generate_metadata_folder() -> None:
-    _create_if_inexistent(_METADATA_FOLDER)
-    metadata = DATA_FETCHER.load_all_am_metadata()
-    for am_id, md in typed_tqdm(metadata.items(), 'Dumping AM metadata'):
-        _dump_am_metadata(am_id, md.to_dict())
+def _generate_ams_folder(serialized_ams: Dict[str, str], folder: str) -> None:
+    for am_id, serialized_am in typed_tqdm(serialized_ams.items(), 'Dumping AMs'):
+        _dump(serialized_am, os.path.join(folder, am_id + '.json'))
 
 
-def _dump_am(am: Dict[str, Any]) -> None:
-    filename = os.path.join(_AMS_FOLDER, am['id'] + '.json')
-    _dump(am, filename)
+@contextmanager
+def _staged_repository_folders(keep_content: bool) -> Iterator[Tuple[str, str]]:
+    # Staging folders live outside of the repository so that they are never committed.
+    with staged_folder(_METADATA_FOLDER, os.path.join(_STAGING_FOLDER, 'metadata'), keep_content) as metadata_folder:
+        with staged_folder(_AMS_FOLDER, os.path.join(_STAGING_FOLDER, 'ams'), keep_content) as ams_folder:
+            yield metadata_folder, ams_folder
 
 
-def _load_ams() -> List[ArreteMinisteriel]:
-    return DATA_FETCHER.build_enriched_ams()
+def generate_am_repository(serialized_ams: Dict[str, str], metadata: Dict[str, AMMetadata]) -> None:
+    """Write the AM repository, replacing its previous content.
 
+    Folders are written in a staging folder and swapped in once complete, so that an
+    interrupted generation leaves the previous content untouched.
 
-def _generate_ams_folder() -> None:
-    _create_if_inexistent(_AMS_FOLDER)
-    ams = _load_ams()
-    for am in typed_tqdm(ams, 'Dumping AMs'):
-        _dump_am(am.to_dict())
+    Args:
+        serialized_ams (Dict[str, str]): dict mapping AM id to the AM serialized with serialize_repository_am.
+        metadata (Dict[str, AMMetadata]): metadata of all AMs, by AM id.
+    """
+    with _staged_repository_folders(keep_content=False) as (metadata_folder, ams_folder):
+        _generate_metadata_folder(metadata, metadata_folder)
+        _generate_ams_folder(serialized_ams, ams_folder)
 
 
-def _empty_directory(folder: str) -> None:
-    if os.path.exists(folder):
-        for file_ in os.listdir(folder):
-            os.remove(os.path.join(folder, file_))
+def update_am_repository(
+    serialized_ams: Dict[str, str], metadata: Dict[str, AMMetadata], removed_am_ids: Set[str]
+) -> None:
+    """Write only the given AMs and their metadata in the repository and delete removed AMs.
 
+    Changes are applied on a staged copy of the repository folders, swapped in once complete.
 
-def generate_am_repository() -> None:
-    _empty_directory(_METADATA_FOLDER)
-    _empty_directory(_AMS_FOLDER)
-    _generate_metadata_folder()
-    _generate_ams_folder()
+    Args:
+        serialized_ams (Dict[str, str]): dict mapping AM id to the AM serialized with serialize_repository_am.
+        metadata (Dict[str, AMMetadata]): metadata of all AMs, by AM id.
+        removed_am_ids (Set[str]): ids of the AMs to delete.
+    """
+    with _staged_repository_folders(keep_content=True) as (metadata_folder, ams_folder):
+        for am_id in removed_am_ids:
+            for folder in (metadata_folder, ams_folder):
+                with suppress(FileNotFoundError):  # Already absent from the repository
+                    os.remove(os.path.join(folder, am_id + '.json'))
+        _generate_metadata_folder({am_id: metadata[am_id] for am_id in serialized_ams}, metadata_folder)
+        _generate_ams_folder(serialized_ams, ams_folder)
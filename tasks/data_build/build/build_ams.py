@@ -1,31 +1,48 @@
 import os
-from typing import List
+from contextlib import suppress
+from typing import Any, Dict, Set
 
-from envinorma.models import ArreteMinisteriel
-from envinorma.utils import typed_tqdm, write_json
+from envinorma.utils import typed_tqdm
 
-from tasks.data_build.config import DATA_FETCHER
+from tasks.common import fast_json
 from tasks.data_build.filenames import ENRICHED_OUTPUT_FOLDER
+from tasks.data_build.utils import staged_symlinked_folder
 
 
-def _remove_previously_enriched_ams() -> None:
-    for file_ in typed_tqdm(os.listdir(ENRICHED_OUTPUT_FOLDER), 'Removing previously enriched files'):
-        os.remove(os.path.join(ENRICHED_OUTPUT_FOLDER, file_))
+def serialize_enriched_am(am: Dict[str, Any]) -> str:
+    return fast_json.dumps(am, ensure_ascii=False)
 
 
-def _create_if_inexistent(folder: str):
-    if not os.path.exists(folder):
-        os.mkdir(folder)
+def _write_ams(serialized_ams: Dict[str, str], folder: str) -> None:
+    for am_id, serialized_am in typed_tqdm(serialized_ams.items(), 'Writing AMs'):
+        full_path = os.path.join(folder, am_id) + '.json'
+        with open(full_path, 'w') as file_:
+            file_.write(serialized_am)
 
 
-def _write_ams(ams: List[ArreteMinisteriel]) -> None:
-    for am in typed_tqdm(ams, 'Writing AMs'):
-        full_path = os.path.join(ENRICHED_OUTPUT_FOLDER, am.id or '') + '.json'
-        write_json(am.to_dict(), full_path, indent=2)
+def generate_ams(serialized_ams: Dict[str, str]) -> None:
+    """Write enriched AMs in ENRICHED_OUTPUT_FOLDER, replacing the previous ones.
 
+    AMs are written in a staging folder which is then swapped in atomically.
 
-def generate_ams() -> None:
-    _create_if_inexistent(ENRICHED_OUTPUT_FOLDER)
-    ams = DATA_FETCHER.build_enriched_ams()
-    _remove_previously_enriched_ams()
-    _write_ams(ams)
+    Args:
+        serialized_ams (Dict[str, str]): dict mapping AM id to the AM serialized with serialize_enriched_am.
+    """
+    with staged_symlinked_folder(ENRICHED_OUTPUT_FOLDER) as staging:
+        _write_ams(serialized_ams, staging)
+
+
+def update_ams(serialized_ams: Dict[str, str], removed_am_ids: Set[str]) -> None:
+    """Write only the given AMs in ENRICHED_OUTPUT_FOLDER and delete removed AMs, keeping the other files.
+
+    Changes are applied on a copy of the current folder which is then swapped in atomically.
+
+    Args:
+        serialized_ams (Dict[str, str]): dict mapping AM id to the AM serialized with serialize_enriched_am.
+        removed_am_ids (Set[str]): ids of the AMs to delete.
+    """
+    with staged_symlinked_folder(ENRICHED_OUTPUT_FOLDER, keep_content=True) as staging:
+        for am_id in removed_am_ids:
+            with suppress(FileNotFoundError):  # Already absent from the current version
+                os.remove(os.path.join(staging, am_id) + '.json')
+        _write_ams(serialized_ams, staging)
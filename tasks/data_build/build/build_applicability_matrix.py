@@ -0,0 +1,136 @@
+'''
+Compute the applicability of the sections of the applicable AMs of every installation, and
+publish it as a sparse matrix (installation x AM section).
+
+Only non default entries are stored: a section of an applicable AM that is neither inapplicable
+nor modified is applicable. Applicable AMs of each installation are given by the
+installation_ams dataset. The matrix is stored in CSR layout in a npz file, with its index:
+    - installation_ids: s3ic id of each row, sorted,
+    - am_ids and section_ids: AM id and section id of each column, sorted,
+    - indptr, indices, data: entries of row i are columns indices[indptr[i]:indptr[i + 1]],
+      with values data[indptr[i]:indptr[i + 1]], a combination of INAPPLICABLE and MODIFIED flags.
+'''
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy
+from envinorma.models import DetailedClassement
+
+from tasks.common.ovh import dump_in_ovh, load_from_ovh
+from tasks.data_build.filenames import dataset_object_name
+from tasks.data_build.load import load_am_metadata, load_classements
+from tasks.regulation_engine.am_index import AMIndex
+from tasks.regulation_engine.batch import AMApplicability, BatchResult, evaluate_installations
+
+INAPPLICABLE = 1
+MODIFIED = 2
+_OBJECT_NAME = dataset_object_name('all', 'applicability_matrix', 'npz')
+
+
+@dataclass
+class ApplicabilityMatrix:
+    installation_ids: numpy.ndarray
+    am_ids: numpy.ndarray
+    section_ids: numpy.ndarray
+    indptr: numpy.ndarray
+    indices: numpy.ndarray
+    data: numpy.ndarray
+
+    def installation_entries(self, s3ic_id: str) -> Dict[Tuple[str, str], int]:
+        """Non default entries of an installation, mapping (am_id, section_id) to INAPPLICABLE/MODIFIED flags."""
+        row = numpy.searchsorted(self.installation_ids, s3ic_id)
+        if row == len(self.installation_ids) or self.installation_ids[row] != s3ic_id:
+            return {}
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return {
+            (str(self.am_ids[column]), str(self.section_ids[column])): int(value)
+            for column, value in zip(self.indices[start:end], self.data[start:end])
+        }
+
+    def dump(self, filename: str) -> None:
+        with open(filename, 'wb') as file_:  # numpy.savez_compressed appends .npz to filenames
+            numpy.savez_compressed(file_, **self.__dict__)
+
+    @classmethod
+    def load(cls, filename: str) -> 'ApplicabilityMatrix':
+        with numpy.load(filename) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+
+def _flags(applicability: AMApplicability) -> Dict[str, int]:
+    flags = {section_id: INAPPLICABLE for section_id in applicability.inapplicable_section_ids}
+    for section_id in applicability.modified_section_ids:
+        flags[section_id] = flags.get(section_id, 0) | MODIFIED
+    return flags
+
+
+def _columns(result: BatchResult) -> Dict[Tuple[str, str], int]:
+    keys = {
+        (am_id, section_id)
+        for applicabilities in result.applicability.values()
+        for am_id, applicability in applicabilities.items()
+        for section_id in _flags(applicability)
+    }
+    return {key: column for column, key in enumerate(sorted(keys))}
+
+
+def _entries(
+    am_id: str, applicability: AMApplicability, columns: Dict[Tuple[str, str], int]
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    entries = sorted((columns[(am_id, section_id)], flag) for section_id, flag in _flags(applicability).items())
+    return (
+        numpy.array([column for column, _ in entries], dtype=numpy.int32),
+        numpy.array([flag for _, flag in entries], dtype=numpy.int8),
+    )
+
+
+def build_applicability_matrix(result: BatchResult) -> ApplicabilityMatrix:
+    """Build the sparse applicability matrix of the installations of a batch evaluation.
+
+    Args:
+        result (BatchResult): result of evaluate_installations.
+
+    Returns:
+        ApplicabilityMatrix: matrix with a row per installation with at least one applicable AM.
+    """
+    columns = _columns(result)
+    am_entries: Dict[int, Tuple[numpy.ndarray, numpy.ndarray]] = {}  # Computed once per shared applicability
+    indptr: List[int] = [0]
+    indices: List[numpy.ndarray] = []
+    data: List[numpy.ndarray] = []
+    installation_ids = sorted(result.applicability)
+    for s3ic_id in installation_ids:
+        nb_entries = indptr[-1]
+        for am_id, applicability in sorted(result.applicability[s3ic_id].items()):
+            if id(applicability) not in am_entries:
+                am_entries[id(applicability)] = _entries(am_id, applicability, columns)
+            am_indices, am_data = am_entries[id(applicability)]
+            indices.append(am_indices)
+            data.append(am_data)
+            nb_entries += len(am_indices)
+        indptr.append(nb_entries)
+    return ApplicabilityMatrix(
+        installation_ids=numpy.array(installation_ids, dtype=str),
+        am_ids=numpy.array([am_id for am_id, _ in columns], dtype=str),
+        section_ids=numpy.array([section_id for _, section_id in columns], dtype=str),
+        indptr=numpy.array(indptr, dtype=numpy.int64),
+        indices=numpy.concatenate(indices) if indices else numpy.array([], dtype=numpy.int32),
+        data=numpy.concatenate(data) if data else numpy.array([], dtype=numpy.int8),
+    )
+
+
+def build_and_dump_applicability_matrix() -> None:
+    classements: List[DetailedClassement] = load_classements('all')
+    am_index = AMIndex(load_am_metadata())
+    result = evaluate_installations(classements, am_index)
+    matrix = build_applicability_matrix(result)
+    dump_in_ovh(_OBJECT_NAME, 'misc', matrix.dump)
+    nb_errors = sum(len(errors) for errors in result.errors.values())
+    print(
+        f'Applicability matrix has {len(matrix.installation_ids)} installations, {len(matrix.section_ids)} sections '
+        f'and {len(matrix.data)} entries, {nb_errors} (installation, AM) pairs could not be evaluated.'
+    )
+
+
+def load_applicability_matrix() -> ApplicabilityMatrix:
+    return load_from_ovh(_OBJECT_NAME, 'misc', ApplicabilityMatrix.load)
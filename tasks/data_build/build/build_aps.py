@@ -1,6 +1,6 @@
 import json
 from collections import Counter
-from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import pandas
 import requests
@@ -9,9 +9,8 @@ from envinorma.models.document import Document, DocumentType
 from tasks.common.ovh import OVHClient, dump_in_ovh, load_from_ovh
 from tasks.data_build.config import AM_SLACK_URL
 from tasks.data_build.filenames import Dataset, dataset_object_name
-from tasks.data_build.load import load_documents_from_csv
-
-OCRStatus = Literal['ERROR', 'SUCCESS', 'NOT_ATTEMPTED']
+from tasks.data_build.load import load_documents_from_csv, load_installation_ids
+from tasks.data_build.validate.check_documents import OCRStatus, check_aps_dataframe
 
 
 def _rowify_ap(ap: Document, status: OCRStatus, document_size: Optional[int]) -> Dict[str, Any]:
@@ -52,12 +51,14 @@ def _ap_dumper(dataframe: pandas.DataFrame) -> Callable[[str], None]:
     return _dump
 
 
-def dump_aps(dataset: Dataset) -> None:
+def dump_aps(dataset: Dataset, installation_ids: Optional[Set[str]] = None) -> None:
     aps = [doc for doc in load_documents_from_csv(dataset) if doc.type == DocumentType.AP]
     print(f'Found {len(aps)} AP for dataset {dataset}.')
     assert len(aps) >= 100, f'Expecting >= 100 aps, got {len(aps)}'
     dataframe = _build_aps_dataframe(aps)
     print(f'Statuses of OCR:\n{dataframe.ocr_status.value_counts()}', end='\n\n')
+    if installation_ids is not None:
+        check_aps_dataframe(dataframe, installation_ids)
     dump_in_ovh(dataset_object_name(dataset, 'aps'), 'misc', _ap_dumper(dataframe))
 
 
@@ -123,7 +124,7 @@ def _load_id_to_status() -> Dict[str, OCRStatus]:
 
 def dump_ap_datasets() -> None:
     previous_statuses = _load_id_to_status()
-    dump_aps('all')
+    dump_aps('all', load_installation_ids('all'))  # Only the complete dataset is checked
     new_statuses = _load_id_to_status()
     _print_stats(previous_statuses, new_statuses)
     dump_aps('idf')
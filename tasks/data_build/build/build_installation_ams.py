@@ -0,0 +1,105 @@
+'''
+Compute, for every installation, the applicable AMs and the parameter values used to apply them,
+and publish them as the installation_ams datasets.
+'''
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas
+from envinorma.models import DetailedClassement, Parameter
+
+from tasks.common.ovh import dump_in_ovh
+from tasks.data_build.filenames import Dataset, dataset_object_name
+from tasks.data_build.load import load_am_metadata, load_classements, load_installation_ids
+from tasks.data_build.utils import typed_tqdm
+from tasks.regulation_engine.am_index import AMIndex
+from tasks.regulation_engine.parameters import known_parameter_dict
+
+_Installation = Tuple[str, List[DetailedClassement]]
+_COLUMNS = ['s3ic_id', 'am_id', 'parameters']
+_NB_INSTALLATIONS_PER_TASK = 2_000
+_AM_INDEX: Optional[AMIndex] = None  # Set once in each worker process
+
+
+def _init_worker(am_index: AMIndex) -> None:
+    global _AM_INDEX
+    _AM_INDEX = am_index
+
+
+def _serialize_value(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _serialize_parameters(parameters: Dict[Parameter, Any]) -> str:
+    values = {parameter.id: _serialize_value(value) for parameter, value in parameters.items()}
+    return json.dumps(values, sort_keys=True)
+
+
+def _installation_rows(s3ic_id: str, classements: List[DetailedClassement], am_index: AMIndex) -> List[List[str]]:
+    rows = []
+    for am_id, am_classements in sorted(am_index.group_by_am_id(classements).items()):
+        parameters = _serialize_parameters(known_parameter_dict(am_classements))  # No date for NC regimes
+        rows.append([s3ic_id, am_id, parameters])
+    return rows
+
+
+def _compute_rows(installations: List[_Installation]) -> List[List[str]]:
+    am_index = _AM_INDEX
+    assert am_index is not None, 'Worker was not initialized'
+    return [row for s3ic_id, classements in installations for row in _installation_rows(s3ic_id, classements, am_index)]
+
+
+def _group_by_installation(classements: List[DetailedClassement]) -> List[_Installation]:
+    groups: Dict[str, List[DetailedClassement]] = {}
+    for classement in classements:
+        groups.setdefault(classement.s3ic_id, []).append(classement)
+    return sorted(groups.items())
+
+
+def build_installation_ams_dataframe(
+    classements: List[DetailedClassement], am_index: AMIndex, max_workers: Optional[int] = None
+) -> pandas.DataFrame:
+    """Compute the applicable AMs of every installation, with the parameter values to apply them, on all cores.
+
+    Args:
+        classements (List[DetailedClassement]): classements of all installations.
+        am_index (AMIndex): index of the AMs to match.
+        max_workers (Optional[int], optional): number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        pandas.DataFrame: one row per (installation, applicable AM), with parameter values serialized in JSON.
+    """
+    installations = _group_by_installation(classements)
+    tasks = [
+        installations[start : start + _NB_INSTALLATIONS_PER_TASK]
+        for start in range(0, len(installations), _NB_INSTALLATIONS_PER_TASK)
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(am_index,)) as executor:
+        row_batches = list(typed_tqdm(executor.map(_compute_rows, tasks), 'Computing installation AMs'))
+    return pandas.DataFrame([row for rows in row_batches for row in rows], columns=_COLUMNS)
+
+
+def _dump(dataframe: pandas.DataFrame, dataset: Dataset) -> None:
+    name = dataset_object_name(dataset, 'installation_ams')
+    dump_in_ovh(name, 'misc', lambda filename: dataframe.to_csv(filename, index=False))
+    print(f'installation_ams dataset {dataset} has {dataframe.shape[0]} rows')
+
+
+def _filter_and_dump(all_installation_ams: pandas.DataFrame, dataset: Dataset) -> None:
+    installation_ids = load_installation_ids(dataset)
+    _dump(all_installation_ams[all_installation_ams.s3ic_id.isin(installation_ids)], dataset)
+
+
+def build_all_installation_ams_datasets(max_workers: Optional[int] = None) -> None:
+    am_index = AMIndex(load_am_metadata())
+    all_installation_ams = build_installation_ams_dataframe(load_classements('all'), am_index, max_workers)
+    _dump(all_installation_ams, 'all')
+    _filter_and_dump(all_installation_ams, 'idf')
+    _filter_and_dump(all_installation_ams, 'sample')
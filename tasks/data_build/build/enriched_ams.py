@@ -0,0 +1,179 @@
+'''
+Enrich all AMs once and serialize them for every AM output (enriched AM folder, AM repository).
+
+Inputs are loaded from the database in the main process with batched queries, enrichment and
+serialization are distributed across a process pool, one AM per task.
+'''
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from envinorma.enriching import enrich
+from envinorma.models import AMMetadata
+from envinorma.utils import typed_tqdm
+
+from tasks.data_build.am_store import update_am_store, write_am_store, write_parametrizations
+from tasks.data_build.build.build_am_repository import (
+    generate_am_repository,
+    serialize_repository_am,
+    update_am_repository,
+)
+from tasks.data_build.build.build_ams import generate_ams, serialize_enriched_am, update_ams
+from tasks.data_build.config import AM_REPOSITORY_FOLDER
+from tasks.data_build.filenames import (
+    AM_STORE_FILENAME,
+    ENRICHED_OUTPUT_FOLDER,
+    PARAMETER_INDEX_FILENAME,
+    PARAMETRIZATIONS_FILENAME,
+)
+from tasks.data_build.load import AMInputs, load_am_inputs
+from tasks.regulation_engine.parameter_index import build_parameter_index
+
+AMSerializer = Callable[[Dict[str, Any]], str]
+
+
+def _enrich_and_serialize(inputs_and_serializers: Tuple[AMInputs, Dict[str, AMSerializer]]) -> Dict[str, str]:
+    inputs, serializers = inputs_and_serializers
+    am_dict = enrich(inputs.am, inputs.parametrization, inputs.metadata).to_dict()
+    return {name: serializer(am_dict) for name, serializer in serializers.items()}
+
+
+def enrich_and_serialize(
+    am_inputs: Dict[str, AMInputs], serializers: Dict[str, AMSerializer], max_workers: Optional[int] = None
+) -> Dict[str, Dict[str, str]]:
+    """Enrich AMs and serialize each of them with every serializer, in a process pool.
+
+    Args:
+        am_inputs (Dict[str, AMInputs]): inputs of the AMs to enrich, by AM id.
+        serializers (Dict[str, AMSerializer]): named serializers, which must be picklable.
+        max_workers (Optional[int], optional): number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        Dict[str, Dict[str, str]]: dict mapping serializer name to the dict mapping AM id to serialized AM.
+    """
+    am_ids = sorted(am_inputs)
+    tasks = [(am_inputs[am_id], serializers) for am_id in am_ids]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(typed_tqdm(executor.map(_enrich_and_serialize, tasks, chunksize=4), 'Enriching AMs'))
+    return {name: {am_id: result[name] for am_id, result in zip(am_ids, results)} for name in serializers}
+
+
+def compute_inputs_hash(inputs: AMInputs) -> str:
+    """Hash of everything an enriched AM is computed from: structured text, parametrization and metadata."""
+    content = {
+        'am': inputs.am.to_dict(),
+        'parametrization': inputs.parametrization.to_dict(),
+        'metadata': inputs.metadata.to_dict(),
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _hashes_filename(folder: str) -> str:
+    return folder.rstrip('/') + '_hashes.json'
+
+
+def _outputs(folder: str) -> List[str]:
+    return [folder, AM_STORE_FILENAME] if folder == ENRICHED_OUTPUT_FOLDER else [folder]
+
+
+def _load_hashes(folder: str) -> Optional[Dict[str, str]]:
+    filename = _hashes_filename(folder)
+    if not os.path.exists(filename) or not all(os.path.exists(output) for output in _outputs(folder)):
+        return None
+    with open(filename) as file_:
+        return json.load(file_)
+
+
+def _dump_hashes(folder: str, hashes: Dict[str, str]) -> None:
+    filename = _hashes_filename(folder)
+    with open(filename + '.tmp', 'w') as file_:
+        json.dump(hashes, file_, indent=2, sort_keys=True)
+    os.replace(filename + '.tmp', filename)
+
+
+def _ids_to_write(hashes: Dict[str, str], previous_hashes: Optional[Dict[str, str]]) -> Set[str]:
+    if previous_hashes is None:
+        return set(hashes)
+    return {am_id for am_id, hash_ in hashes.items() if previous_hashes.get(am_id) != hash_}
+
+
+def generate_enriched_ams(
+    with_repository: bool = True, incremental: bool = False, max_workers: Optional[int] = None
+) -> None:
+    """Enrich AMs once and write them in ENRICHED_OUTPUT_FOLDER, AM_STORE_FILENAME and, optionally, the AM repository.
+
+    A hash of the inputs of each AM is stored next to each output folder. In incremental mode,
+    only AMs whose hash changed since the previous generation are enriched and rewritten, and
+    only AMs that disappeared are deleted. Without previous hashes, everything is regenerated.
+    Parametrizations of all AMs are always rewritten in PARAMETRIZATIONS_FILENAME, and the index of
+    the parameters they use in PARAMETER_INDEX_FILENAME.
+
+    Args:
+        with_repository (bool, optional): also generate the AM repository. Defaults to True.
+        incremental (bool, optional): only regenerate AMs whose inputs changed. Defaults to False.
+        max_workers (Optional[int], optional): number of processes. Defaults to the number of CPUs.
+    """
+    am_inputs = load_am_inputs()
+    hashes = {am_id: compute_inputs_hash(inputs) for am_id, inputs in am_inputs.items()}
+    serializers: Dict[str, AMSerializer] = {ENRICHED_OUTPUT_FOLDER: serialize_enriched_am}
+    if with_repository:
+        serializers[AM_REPOSITORY_FOLDER] = serialize_repository_am
+    previous_hashes = {folder: _load_hashes(folder) if incremental else None for folder in serializers}
+    ids_to_write = {folder: _ids_to_write(hashes, previous_hashes[folder]) for folder in serializers}
+    ids_to_enrich = set.union(*ids_to_write.values())
+    print(f'{len(ids_to_enrich)}/{len(am_inputs)} AMs to enrich.')
+    serialized_ams = enrich_and_serialize({id_: am_inputs[id_] for id_ in ids_to_enrich}, serializers, max_workers)
+    metadata = {am_id: inputs.metadata for am_id, inputs in am_inputs.items()}
+    for folder in serializers:
+        previous = previous_hashes[folder]
+        to_write = {id_: serialized_ams[folder][id_] for id_ in ids_to_write[folder]}
+        if folder == ENRICHED_OUTPUT_FOLDER:
+            _write_enriched_ams(to_write, previous, set(hashes))
+        else:
+            _write_repository(to_write, metadata, previous, set(hashes))
+        _dump_hashes(folder, hashes)
+    parametrizations = {am_id: inputs.parametrization for am_id, inputs in am_inputs.items()}
+    write_parametrizations(parametrizations, PARAMETRIZATIONS_FILENAME)
+    build_parameter_index(parametrizations).dump(PARAMETER_INDEX_FILENAME)
+
+
+def _write_enriched_ams(
+    serialized_ams: Dict[str, str], previous_hashes: Optional[Dict[str, str]], am_ids: Set[str]
+) -> None:
+    if previous_hashes is None:
+        generate_ams(serialized_ams)
+        write_am_store(serialized_ams, AM_STORE_FILENAME)
+    else:
+        removed_am_ids = set(previous_hashes) - am_ids
+        update_ams(serialized_ams, removed_am_ids)
+        update_am_store(serialized_ams, removed_am_ids, AM_STORE_FILENAME)
+
+
+def replace_enriched_ams(serialized_ams: Dict[str, str]) -> None:
+    """Replace the AMs of ENRICHED_OUTPUT_FOLDER and AM_STORE_FILENAME, for AMs modified after enrichment.
+
+    The folder is staged and swapped in atomically. Its content no longer derives from the hashed
+    inputs only, so its hashes are deleted first: the next incremental generation rewrites all AMs.
+
+    Args:
+        serialized_ams (Dict[str, str]): dict mapping AM id to the AM serialized with serialize_enriched_am.
+    """
+    with suppress(FileNotFoundError):
+        os.remove(_hashes_filename(ENRICHED_OUTPUT_FOLDER))
+    generate_ams(serialized_ams)
+    write_am_store(serialized_ams, AM_STORE_FILENAME)
+
+
+def _write_repository(
+    serialized_ams: Dict[str, str],
+    metadata: Dict[str, AMMetadata],
+    previous_hashes: Optional[Dict[str, str]],
+    am_ids: Set[str],
+) -> None:
+    if previous_hashes is None:
+        generate_am_repository(serialized_ams, metadata)
+    else:
+        update_am_repository(serialized_ams, metadata, set(previous_hashes) - am_ids)
@@ -1,42 +1,97 @@
+import io
+import json
 import tarfile
 import os
 from dataclasses import fields
-from typing import cast
+from typing import IO, Dict, Optional, Union, cast
 
 import pandas as pd
+import requests
 from envinorma.models.document import Document
+from envinorma.utils import write_json
 
 from tasks.common.ovh import dump_in_ovh
-from tasks.common import download_document
 from tasks.data_build.config import GEORISQUES_DATA_FOLDER, GEORISQUES_DUMP_URL
 from tasks.data_build.filenames import Dataset, dataset_object_name
 from tasks.data_build.load import load_documents_csv, load_installation_ids
 
 _COLS = ['id_document', 'code_s3ic', 'type_id_document', 'nom', 'url_document', 'date_document']
+_DOCUMENTS_MEMBER = 'IC_documents.csv'
+_TYPES_MEMBER = 'IC_types_document.csv'
+_MEMBER_COLUMNS = {_DOCUMENTS_MEMBER: _COLS, _TYPES_MEMBER: ['id', 'type']}
+_EXTRACTED_MEMBERS = {_DOCUMENTS_MEMBER, _TYPES_MEMBER, 'IC_etablissement.csv', 'IC_ref_nomenclature_ic.csv'}
+_VERSION_FILENAME = os.path.join(GEORISQUES_DATA_FOLDER, 'georisques_data_version.json')
+_TIMEOUT_IN_SECONDS = 60
 
 
-def _download_and_extract_zip() -> None:
-    print('Downloading Georisques zip file...')
-    zip_file = os.path.join(GEORISQUES_DATA_FOLDER, 'georisques_data.tar.gz')
-    download_document(GEORISQUES_DUMP_URL, zip_file)
-    with tarfile.open(zip_file, 'r:gz') as zip_ref:
-        zip_ref.extractall(GEORISQUES_DATA_FOLDER)
+def _read_member(source: Union[str, IO[bytes]], member_name: str) -> pd.DataFrame:
+    columns = _MEMBER_COLUMNS[member_name]
+    return pd.read_csv(source, sep=';', header=None, names=columns, dtype='str')  # type: ignore
+
+
+def _remote_version() -> Dict[str, str]:
+    response = requests.head(GEORISQUES_DUMP_URL, allow_redirects=True, timeout=_TIMEOUT_IN_SECONDS)
+    response.raise_for_status()
+    return {key: response.headers[key] for key in ('ETag', 'Last-Modified') if key in response.headers}
+
 
+def _load_local_version() -> Optional[Dict[str, str]]:
+    if not os.path.exists(_VERSION_FILENAME):
+        return None
+    with open(_VERSION_FILENAME) as file_:
+        return json.load(file_)
 
-def _load_georisques_documents() -> pd.DataFrame:
-    input_filename = os.path.join(GEORISQUES_DATA_FOLDER, 'IC_documents.csv')
-    result = pd.read_csv(input_filename, sep=';', header=None, names=_COLS, dtype='str')  # type: ignore
-    return result
 
+def _members_were_extracted() -> bool:
+    return all(os.path.exists(os.path.join(GEORISQUES_DATA_FOLDER, name)) for name in _EXTRACTED_MEMBERS)
 
-def _load_type_mapping() -> pd.DataFrame:
-    input_filename = os.path.join(GEORISQUES_DATA_FOLDER, 'IC_types_document.csv')
-    return pd.read_csv(input_filename, sep=';', header=None, names=['id', 'type'], dtype='str')  # type: ignore
 
+def _write_member(name: str, content: bytes) -> None:
+    filename = os.path.join(GEORISQUES_DATA_FOLDER, name)
+    with open(filename + '.tmp', 'wb') as file_:
+        file_.write(content)
+    os.replace(filename + '.tmp', filename)
 
-def _convert_to_envinorma_format(georisques_documents: pd.DataFrame) -> pd.DataFrame:
+
+def _download_and_extract_members(remote_version: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+    """Stream the Georisques tarball, extract the members we use and parse the document tables on the fly.
+
+    The download stops as soon as all needed members have been read.
+    """
+    print('Downloading Georisques zip file...')
+    tables: Dict[str, pd.DataFrame] = {}
+    remaining_members = set(_EXTRACTED_MEMBERS)
+    with requests.get(GEORISQUES_DUMP_URL, stream=True, timeout=_TIMEOUT_IN_SECONDS) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        with tarfile.open(fileobj=response.raw, mode='r|gz') as archive:
+            for member in archive:
+                name = os.path.basename(member.name)
+                if name not in remaining_members or not member.isfile():
+                    continue
+                content = cast(IO[bytes], archive.extractfile(member)).read()
+                _write_member(name, content)
+                if name in _MEMBER_COLUMNS:
+                    tables[name] = _read_member(io.BytesIO(content), name)
+                remaining_members.remove(name)
+                if not remaining_members:
+                    break
+    if remaining_members:
+        raise ValueError(f'Members {sorted(remaining_members)} not found in Georisques dump.')
+    write_json(remote_version, _VERSION_FILENAME)
+    return tables
+
+
+def _load_member_tables() -> Dict[str, pd.DataFrame]:
+    remote_version = _remote_version()
+    if remote_version and remote_version == _load_local_version() and _members_were_extracted():
+        print('Georisques dump has not changed since last extraction, skipping download.')
+        return {name: _read_member(os.path.join(GEORISQUES_DATA_FOLDER, name), name) for name in _MEMBER_COLUMNS}
+    return _download_and_extract_members(remote_version)
+
+
+def _convert_to_envinorma_format(georisques_documents: pd.DataFrame, type_mapping: pd.DataFrame) -> pd.DataFrame:
     georisques_documents = georisques_documents.copy()
-    type_mapping = _load_type_mapping()
     doc_with_types = pd.merge(georisques_documents, type_mapping, left_on='type_id_document', right_on='id', how='left')
     doc_with_types['s3ic_id'] = doc_with_types['code_s3ic']
     doc_with_types['date'] = doc_with_types['date_document']
@@ -47,9 +102,8 @@ def _convert_to_envinorma_format(georisques_documents: pd.DataFrame) -> pd.DataF
 
 
 def build_all_documents() -> None:
-    _download_and_extract_zip()
-    georisques_documents = _load_georisques_documents()
-    envinorma_documents = _convert_to_envinorma_format(georisques_documents)
+    tables = _load_member_tables()
+    envinorma_documents = _convert_to_envinorma_format(tables[_DOCUMENTS_MEMBER], tables[_TYPES_MEMBER])
     sorted_documents = envinorma_documents.sort_values(by='s3ic_id')
     dump_in_ovh(
         dataset_object_name('all', 'documents'), 'misc', lambda filename: sorted_documents.to_csv(filename, index=False)
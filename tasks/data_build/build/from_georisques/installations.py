@@ -1,9 +1,10 @@
 '''Generate installations datasets from georisques data.'''
 import os
 from dataclasses import fields
+from functools import lru_cache
 from pathlib import Path
 from tasks.common.ovh import dump_in_ovh
-from typing import Dict, Optional, Tuple, Union
+from typing import Optional, Union
 
 import pandas as pd
 from envinorma.models import Regime
@@ -12,6 +13,7 @@ from envinorma.models.installation import ActivityStatus, Installation, Installa
 from tasks.data_build.config import GEORISQUES_DATA_FOLDER
 from tasks.data_build.filenames import Dataset, dataset_object_name
 from tasks.data_build.load import load_installations_csv
+from tasks.data_build.validate.check_installations import check_installations_dataframe
 
 _COLS = [
     'code_s3ic',
@@ -58,11 +60,30 @@ def _extract_num_dep(code_insee: Union[int, Optional[str]]) -> str:
     return code_insee[:2]
 
 
-def _load_geomapping() -> Dict[str, Tuple[str, str]]:
-    mapping_dataframe = pd.read_csv(Path(__file__).parent / 'geomapping.csv')
-    return {
-        str(row['num_dep']): (str(row['region']), str(row['department'])) for _, row in mapping_dataframe.iterrows()
-    }
+@lru_cache
+def _load_geomapping() -> pd.DataFrame:
+    mapping = pd.read_csv(Path(__file__).parent / 'geomapping.csv', dtype='str')
+    duplicated = mapping.num_dep[mapping.num_dep.duplicated()].tolist()
+    if duplicated:
+        raise ValueError(f'Departments appear several times in geomapping: {duplicated}')
+    return mapping[['num_dep', 'region', 'department']]
+
+
+def _report_unmapped_departments(installations: pd.DataFrame) -> None:
+    unmapped = installations[installations.region.isna()]
+    if unmapped.empty:
+        return
+    counts = unmapped.num_dep.value_counts(dropna=False)
+    details = ', '.join(f'{num_dep or "<empty>"}: {nb}' for num_dep, nb in counts.items())
+    print(f'{len(unmapped)} installations have an unmapped department ({details}).')
+
+
+def _add_region_and_department(installations: pd.DataFrame) -> pd.DataFrame:
+    with_geo = installations.merge(_load_geomapping(), on='num_dep', how='left', validate='many_to_one')
+    _report_unmapped_departments(with_geo)
+    with_geo['region'] = with_geo.region.fillna('')
+    with_geo['department'] = with_geo.department.fillna('')
+    return with_geo
 
 
 def _extract_family(family_code: str) -> str:
@@ -111,9 +132,7 @@ def _convert_to_envinorma_installations(installations: pd.DataFrame) -> pd.DataF
     installations = installations.copy()
     installations['s3ic_id'] = installations.code_s3ic
     installations['num_dep'] = installations.insee_code.apply(_extract_num_dep)
-    geomapping = _load_geomapping()
-    installations['region'] = installations.num_dep.apply(lambda x: geomapping[x][0])
-    installations['department'] = installations.num_dep.apply(lambda x: geomapping[x][1])
+    installations = _add_region_and_department(installations)
     installations['city'] = installations.nomcommune
     installations['name'] = installations.raison_sociale
     installations['lat'] = installations.x
@@ -133,6 +152,7 @@ def _convert_to_envinorma_installations(installations: pd.DataFrame) -> pd.DataF
 def build_all_installations() -> None:
     georisques_installations = _load_georisques_installations()
     envinorma_installations = _convert_to_envinorma_installations(georisques_installations)
+    check_installations_dataframe(envinorma_installations)
     name = dataset_object_name('all', 'installations')
     dump_in_ovh(
         name, 'misc', lambda filename: envinorma_installations.sort_values(by='s3ic_id').to_csv(filename, index=False)
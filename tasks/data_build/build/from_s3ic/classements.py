@@ -8,6 +8,7 @@ from tqdm import tqdm
 from envinorma.models import DetailedClassement, DetailedRegime, DetailedClassementState
 from tasks.data_build.load import load_classements_csv, load_installation_ids
 from tasks.data_build.filenames import S3IC_RUBRIQUES_FILENAME, Dataset, dataset_object_name
+from tasks.data_build.validate.check_classements import check_classements_dataframe
 
 
 def _load_deduplicated_classements() -> pd.DataFrame:
@@ -75,17 +76,19 @@ def _filter_47xx(dataframe: pd.DataFrame) -> pd.DataFrame:
     return dataframe
 
 
-def _build_csv() -> pd.DataFrame:
+def _build_csv(installation_ids: Set[str]) -> pd.DataFrame:
     deduplicated_classements = _load_deduplicated_classements()
-    classements_in = _keep_classements_having_installation(deduplicated_classements, load_installation_ids())
+    classements_in = _keep_classements_having_installation(deduplicated_classements, installation_ids)
     classements_with_renamed_columns = _rename_classements_columns(classements_in)
     final_classements = _modify_and_keep_final_classements_cols(classements_with_renamed_columns)
     return _filter_47xx(final_classements)
 
 
 def build_classements_csv() -> None:
-    classements = _build_csv()
+    installation_ids = load_installation_ids()
+    classements = _build_csv(installation_ids)
     _check_classements(classements)
+    check_classements_dataframe(classements, installation_ids)
     keys = ['s3ic_id', 'date_autorisation', 'date_mise_en_service', 'regime', 'rubrique', 'alinea']
     name = dataset_object_name('all', 'classements')
     dump_in_ovh(name, 'misc', lambda filename: classements.sort_values(keys).to_csv(filename, index=False))
@@ -1,58 +1,163 @@
+import argparse
 import json
 import os
-from tasks.common.ovh import dump_in_ovh
-from typing import Dict, List
-
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tasks.common.ovh import OVHClient, dump_in_ovh, load_from_ovh
+from typing import Any, Dict, Iterator, List, Set, TextIO
+
+import pandas as pd
 import requests
 from envinorma.models.document import Document
-from envinorma.utils import batch, typed_tqdm, write_json
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
 
 from tasks.data_build.filenames import GEORISQUES_URL, Dataset, dataset_object_name
-from tasks.data_build.load import load_documents_from_csv, load_installation_ids
+from tasks.data_build.load import load_installation_ids
+
+_CHECKPOINT_FILENAME = 'checkpoint.jsonl'
+_DEFAULT_MAX_WORKERS = 8
+_DEFAULT_MAX_REQUESTS_PER_SECOND = 10.0
+_DEFAULT_NB_ATTEMPTS = 3
+_TIMEOUT_IN_SECONDS = 30
+_CSV_CHUNK_SIZE = 10_000
+
+
+class _RateLimiter:
+    """Spreads calls to `wait` so that at most `max_per_second` calls return per second, across threads."""
+
+    def __init__(self, max_per_second: float) -> None:
+        self._interval = 1 / max_per_second
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        time.sleep(max(0.0, slot - now))
 
 
 def _no_docs(dicts: List[Dict]) -> bool:
     return len(dicts) == 1 and all([x is None for x in dicts[0].values()])
 
 
-def _download_batch(s3ic_ids: List[str]) -> List[Document]:
-    res: List[Document] = []
-    for id_ in typed_tqdm(s3ic_ids, desc='Fetching document references', leave=False):
-        remote_id = id_.replace('.', '-')
-        response = requests.get(f'{GEORISQUES_URL}/installations/etablissement/{remote_id}/texte')
+def _build_session(max_workers: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount('https://', adapter)
+    return session
+
+
+def _fetch_document_dicts(
+    session: requests.Session, rate_limiter: _RateLimiter, s3ic_id: str, nb_attempts: int
+) -> List[Dict]:
+    remote_id = s3ic_id.replace('.', '-')
+    url = f'{GEORISQUES_URL}/installations/etablissement/{remote_id}/texte'
+    for attempt in range(nb_attempts):
+        rate_limiter.wait()
         try:
-            dicts = response.json()
-            if _no_docs(dicts):
+            response = session.get(url, timeout=_TIMEOUT_IN_SECONDS)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError):
+            if attempt == nb_attempts - 1:
+                raise
+            time.sleep(2 ** attempt)
+    raise ValueError(f'nb_attempts must be positive, got {nb_attempts}')
+
+
+def _fetch_documents(
+    session: requests.Session, rate_limiter: _RateLimiter, s3ic_id: str, nb_attempts: int
+) -> List[Document]:
+    dicts = _fetch_document_dicts(session, rate_limiter, s3ic_id, nb_attempts)
+    if _no_docs(dicts):
+        return []
+    return [Document.from_georisques_dict(dict_, s3ic_id) for dict_ in dicts]
+
+
+def _load_checkpoint_records(checkpoint_filename: str) -> Iterator[Dict[str, Any]]:
+    with open(checkpoint_filename) as file_:
+        for line in file_:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f'Skipping undecodable checkpoint line: {line[:100]!r}')
+
+
+def _load_fetched_ids(checkpoint_filename: str) -> Set[str]:
+    """Load the ids of the checkpoint, rewriting it without lines truncated by an interrupted run.
+
+    Appending to a checkpoint ending with a truncated line would merge the next record into it.
+    Dropped records are fetched again.
+    """
+    if not os.path.exists(checkpoint_filename):
+        return set()
+    records = list(_load_checkpoint_records(checkpoint_filename))
+    with open(checkpoint_filename + '.tmp', 'w') as file_:
+        file_.writelines(_json_line(record) for record in records)
+    os.replace(checkpoint_filename + '.tmp', checkpoint_filename)
+    return {record['s3ic_id'] for record in records}
+
+
+def _append_to_checkpoint(checkpoint: TextIO, s3ic_id: str, docs: List[Document]) -> None:
+    checkpoint.write(_json_line({'s3ic_id': s3ic_id, 'documents': [doc.to_dict() for doc in docs]}))
+    checkpoint.flush()
+
+
+def _fetch_and_checkpoint(
+    s3ic_ids: List[str], checkpoint_filename: str, max_workers: int, max_requests_per_second: float, nb_attempts: int
+) -> List[str]:
+    session = _build_session(max_workers)
+    rate_limiter = _RateLimiter(max_requests_per_second)
+    failed_ids: List[str] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, open(checkpoint_filename, 'a') as checkpoint:
+        futures = {
+            executor.submit(_fetch_documents, session, rate_limiter, id_, nb_attempts): id_ for id_ in s3ic_ids
+        }
+        for future in tqdm(as_completed(futures), 'Fetching document references', total=len(futures)):
+            id_ = futures[future]
+            try:
+                docs = future.result()
+            except Exception as exc:  # pylint: disable=broad-except
+                print(id_, str(exc))
+                failed_ids.append(id_)
                 continue
-            docs = [Document.from_georisques_dict(dict_, id_) for dict_ in dicts]
-            res.extend(docs)
-        except Exception as exc:  # pylint: disable=broad-except
-            print(id_, str(exc), response.content.decode())
-    return res
+            _append_to_checkpoint(checkpoint, id_, docs)
+    return failed_ids
 
 
-def _dump_docs(docs: List[Document], filename: str) -> None:
-    json_ = [doc.to_dict() for doc in docs]
-    write_json(json_, filename, pretty=False)
-    print(f'Downloaded {len(docs)} documents in batch {filename}')
+def _json_line(dict_: Dict[str, Any]) -> str:
+    return json.dumps(dict_) + '\n'
 
 
-def _download_if_inexistent(filename: str, s3ic_ids: List[str]) -> None:
-    if not os.path.exists(filename):
-        docs = _download_batch(s3ic_ids)
-        _dump_docs(docs, filename)
-        return
-    print(f'Batch {filename} exists')
+def _combine_and_dump(checkpoint_filename: str, output_filename: str) -> None:
+    """Concatenate the documents of the checkpoint records in a JSON-lines file, one document per line."""
+    with open(output_filename, 'w') as output:
+        for record in _load_checkpoint_records(checkpoint_filename):
+            output.writelines(_json_line(doc) for doc in record['documents'])
 
 
-def _load_batch(filename: str) -> Dict[str, List[Dict]]:
-    with open(filename) as file_:
-        return json.load(file_)
+def _jsonl_to_json(jsonl_filename: str, json_filename: str) -> None:
+    """Write the documents of a JSON-lines file as a JSON list, streaming one line at a time."""
+    with open(jsonl_filename) as input_, open(json_filename, 'w') as output:
+        output.write('[')
+        for index, line in enumerate(input_):
+            output.write((', ' if index else '') + line.rstrip('\n'))
+        output.write(']')
 
 
-def _combine_and_dump(batch_filenames: List[str], output_filename: str) -> None:
-    result = [doc for batch_filename in batch_filenames for doc in _load_batch(batch_filename)]
-    write_json(result, output_filename, pretty=False)
+def _upload_jsonl_and_json(jsonl_filename: str, dataset: Dataset) -> None:
+    """Upload documents in JSON lines and, for existing consumers, in a JSON list."""
+    OVHClient.upload_document('misc', jsonl_filename, dataset_object_name(dataset, 'documents', 'jsonl'))
+    dump_in_ovh(
+        dataset_object_name(dataset, 'documents', 'json'),
+        'misc',
+        lambda filename: _jsonl_to_json(jsonl_filename, filename),
+    )
 
 
 def _create_if_inexistent(folder: str) -> None:
@@ -60,28 +165,81 @@ def _create_if_inexistent(folder: str) -> None:
         os.mkdir(folder)
 
 
-def download_georisques_documents(dataset: Dataset = 'all') -> None:
-    s3ic_ids = sorted(list(load_installation_ids(dataset)))
+def download_georisques_documents(
+    dataset: Dataset = 'all',
+    max_workers: int = _DEFAULT_MAX_WORKERS,
+    max_requests_per_second: float = _DEFAULT_MAX_REQUESTS_PER_SECOND,
+    nb_attempts: int = _DEFAULT_NB_ATTEMPTS,
+) -> None:
+    """Fetch the document references of all installations of a dataset and upload them to OVH.
+
+    Each installation is checkpointed as soon as its references are fetched, so an interrupted
+    run resumes with the installations that were not fetched yet.
+
+    Args:
+        dataset (Dataset, optional): dataset whose installations are fetched. Defaults to 'all'.
+        max_workers (int, optional): number of concurrent requests. Defaults to 8.
+        max_requests_per_second (float, optional): global rate limit on Georisques. Defaults to 10.
+        nb_attempts (int, optional): number of attempts per installation. Defaults to 3.
+    """
+    s3ic_ids = sorted(load_installation_ids(dataset))
     folder = f'docs_dl_batches_{dataset}'
     _create_if_inexistent(folder)
-    batches = batch(s3ic_ids, 1000)
-    filenames = [f'{folder}/{batch_id}.json' for batch_id in range(len(batches))]
-    for filename, batch_ in typed_tqdm(list(zip(filenames, batches)), 'Downloading document batches'):
-        _download_if_inexistent(filename, batch_)
-    name = dataset_object_name(dataset, 'documents', 'json')
-    dump_in_ovh(name, 'misc', lambda filename: _combine_and_dump(filenames, filename))
-
-
-def _filter_and_dump(all_documents: List[Document], dataset: Dataset) -> None:
-    doc_ids = load_installation_ids(dataset)
-    docs = [doc for doc in all_documents if doc.s3ic_id in doc_ids]
-    name = dataset_object_name(dataset, 'documents', 'json')
-    dump_in_ovh(name, 'misc', lambda filename: _dump_docs(docs, filename))
-    print(f'documents dataset {dataset} has {len(docs)} rows')
-    assert len(docs) >= 100, f'Expecting >= 100 docs, got {len(docs)}'
+    checkpoint_filename = os.path.join(folder, _CHECKPOINT_FILENAME)
+    fetched_ids = _load_fetched_ids(checkpoint_filename)
+    remaining_ids = [id_ for id_ in s3ic_ids if id_ not in fetched_ids]
+    print(f'{len(s3ic_ids) - len(remaining_ids)} installations already fetched, {len(remaining_ids)} remaining.')
+    failed_ids = _fetch_and_checkpoint(
+        remaining_ids, checkpoint_filename, max_workers, max_requests_per_second, nb_attempts
+    )
+    if failed_ids:
+        raise ValueError(f'Fetching failed for {len(failed_ids)} installations, run again to resume.')
+    with tempfile.NamedTemporaryFile('w') as file_:
+        _combine_and_dump(checkpoint_filename, file_.name)
+        _upload_jsonl_and_json(file_.name, dataset)
+
+
+def _iter_csv_documents(filename: str) -> Iterator[Document]:
+    for chunk in pd.read_csv(filename, dtype='str', chunksize=_CSV_CHUNK_SIZE):
+        for record in chunk.fillna('').to_dict(orient='records'):
+            yield Document.from_dict(record)
+
+
+def _write_filtered_documents(source_filename: str, installation_ids: Set[str], output_filename: str) -> int:
+    nb_docs = 0
+    with open(output_filename, 'w') as output:
+        for doc in _iter_csv_documents(source_filename):
+            if doc.s3ic_id in installation_ids:
+                output.write(_json_line(doc.to_dict()))
+                nb_docs += 1
+    return nb_docs
+
+
+def _filter_and_dump(all_documents_filename: str, dataset: Dataset) -> None:
+    installation_ids = load_installation_ids(dataset)
+    with tempfile.NamedTemporaryFile('w') as file_:
+        nb_docs = _write_filtered_documents(all_documents_filename, installation_ids, file_.name)
+        print(f'documents dataset {dataset} has {nb_docs} rows')
+        assert nb_docs >= 100, f'Expecting >= 100 docs, got {nb_docs}'
+        _upload_jsonl_and_json(file_.name, dataset)
+
+
+def _filter_and_dump_all(all_documents_filename: str) -> None:
+    _filter_and_dump(all_documents_filename, 'sample')
+    _filter_and_dump(all_documents_filename, 'idf')
 
 
 def build_all_document_datasets() -> None:
-    all_documents = load_documents_from_csv('all')
-    _filter_and_dump(all_documents, 'sample')
-    _filter_and_dump(all_documents, 'idf')
+    load_from_ovh(dataset_object_name('all', 'documents'), 'misc', _filter_and_dump_all)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch the document references of installations from Georisques')
+    parser.add_argument('--dataset', default='all', choices=['all', 'idf', 'sample'])
+    parser.add_argument('--max-workers', type=int, default=_DEFAULT_MAX_WORKERS, help='Concurrent requests')
+    parser.add_argument(
+        '--max-requests-per-second', type=float, default=_DEFAULT_MAX_REQUESTS_PER_SECOND, help='Global rate limit'
+    )
+    parser.add_argument('--nb-attempts', type=int, default=_DEFAULT_NB_ATTEMPTS, help='Attempts per installation')
+    args = parser.parse_args()
+    download_georisques_documents(args.dataset, args.max_workers, args.max_requests_per_second, args.nb_attempts)
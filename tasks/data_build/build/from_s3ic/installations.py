@@ -9,6 +9,7 @@ from envinorma.models.installation import ActivityStatus, Installation, Installa
 from tqdm import tqdm
 
 from tasks.data_build.filenames import S3IC_INSTALLATIONS_FILENAME, Dataset, dataset_object_name
+from tasks.data_build.validate.check_installations import check_installations_dataframe
 
 
 def _load_A_E_installations() -> pd.DataFrame:
@@ -104,6 +105,7 @@ def build_installations_csv() -> None:
     final_installations = _modify_and_keep_final_installations_cols(installations_with_renamed_columns)
     _check_installations(final_installations)
     final_active_installations = final_installations[final_installations.active.apply(_active_or_in_construction)]
+    check_installations_dataframe(final_active_installations)
     name = dataset_object_name('all', 'installations')
     dump_in_ovh(name, 'misc', lambda filename: final_active_installations.to_csv(filename, index=False))
     print(f'Dumped {final_active_installations.shape[0]} active installations.')
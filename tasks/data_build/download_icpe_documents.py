@@ -1,47 +1,213 @@
 '''
 Script for retrieving the list of ICPE documents
+
+Documents are fetched from cquest, falling back on Georisques. In mirror mode, all AP
+are downloaded concurrently; interrupted downloads are resumed with HTTP Range requests
+and every fetched file is recorded in a manifest with its mirror, size and checksum.
 '''
+import argparse
+import hashlib
+import json
 import os
 import random
-from typing import List
-from urllib.request import HTTPError, urlretrieve  # type: ignore
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
 
+import requests
 from envinorma.models.document import Document, DocumentType
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 from tasks.data_build.filenames import CQUEST_URL, DOCUMENTS_FOLDER, GEORISQUES_DOWNLOAD_URL
 from tasks.data_build.load import load_documents_from_csv
 
 _BAR_FORMAT = '{l_bar}{r_bar}'
+_MIRRORS: List[Tuple[str, str]] = [('cquest', CQUEST_URL), ('georisques', GEORISQUES_DOWNLOAD_URL)]
+_MANIFEST_FILENAME = os.path.join(DOCUMENTS_FOLDER, 'manifest.jsonl')
+_CHUNK_SIZE = 2 ** 16
+_TIMEOUT_IN_SECONDS = 60
+_DEFAULT_MAX_WORKERS = 8
 
 
-def _download_file_if_doesnt_exist(source: str, destination: str) -> bool:
-    if os.path.exists(destination):
-        print('file exists')
-        return False
-    try:
-        urlretrieve(source, destination)
-    except HTTPError as exc:
-        print(source, exc)
+class _DocumentNotFound(Exception):
+    pass
+
+
+class _IncompleteDownload(Exception):
+    pass
+
+
+@dataclass
+class _ManifestEntry:
+    url: str
+    mirror: Optional[str]
+    size: int
+    sha256: str
+
+
+def _destination(url: str) -> str:
+    return DOCUMENTS_FOLDER + '/' + url.replace('/', '_')
+
+
+def _sha256(filename: str) -> str:
+    hash_ = hashlib.sha256()
+    with open(filename, 'rb') as file_:
+        for chunk in iter(lambda: file_.read(_CHUNK_SIZE), b''):
+            hash_.update(chunk)
+    return hash_.hexdigest()
+
+
+def _expected_size(response: requests.Response) -> Optional[int]:
+    if response.status_code == 206:
+        content_range = response.headers.get('Content-Range', '')
+        total = content_range.split('/')[-1]
+        return int(total) if total.isdigit() else None
+    content_length = response.headers.get('Content-Length')
+    return int(content_length) if content_length and content_length.isdigit() else None
+
+
+def _download_with_resume(session: requests.Session, source: str, destination: str) -> int:
+    partial_filename = destination + '.part'
+    offset = os.path.getsize(partial_filename) if os.path.exists(partial_filename) else 0
+    headers = {'Accept-Encoding': 'identity'}  # Content-Length must be the size of the file, not of an encoding
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+    with session.get(source, headers=headers, stream=True, timeout=_TIMEOUT_IN_SECONDS) as response:
+        if response.status_code == 416:  # partial file is stale or already complete, start again
+            os.remove(partial_filename)
+            return _download_with_resume(session, source, destination)
+        if response.status_code == 404:
+            raise _DocumentNotFound(source)
+        response.raise_for_status()
+        expected_size = _expected_size(response)
+        mode = 'ab' if response.status_code == 206 else 'wb'  # servers ignoring Range answer 200
+        with open(partial_filename, mode) as file_:
+            for chunk in response.iter_content(_CHUNK_SIZE):
+                file_.write(chunk)
+    size = os.path.getsize(partial_filename)
+    if expected_size is not None and size != expected_size:
+        raise _IncompleteDownload(f'Incomplete download of {source}: got {size} bytes, expected {expected_size}.')
+    os.replace(partial_filename, destination)
+    return size
+
+
+def _should_try_next_mirror(exc: Exception) -> bool:
+    if isinstance(exc, (_DocumentNotFound, _IncompleteDownload, requests.ConnectionError, requests.Timeout)):
         return True
-    return False
+    return isinstance(exc, requests.HTTPError) and exc.response is not None and exc.response.status_code >= 500
+
+
+def _download_from_mirrors(session: requests.Session, url: str) -> _ManifestEntry:
+    destination = _destination(url)
+    errors: List[str] = []
+    for mirror, base_url in _MIRRORS:
+        try:
+            size = _download_with_resume(session, base_url + '/' + url, destination)
+        except Exception as exc:  # pylint: disable=broad-except
+            if not _should_try_next_mirror(exc):
+                raise
+            errors.append(f'{mirror}: {exc}')
+            if os.path.exists(destination + '.part'):  # Do not resume with the bytes of another mirror
+                os.remove(destination + '.part')
+            continue
+        return _ManifestEntry(url, mirror, size, _sha256(destination))
+    raise ValueError(f'{url} could not be downloaded from any mirror: {"; ".join(errors)}')
+
+
+def _is_valid(entry: Optional[_ManifestEntry], destination: str, verify_checksums: bool) -> bool:
+    if entry is None or not os.path.exists(destination):
+        return False
+    if os.path.getsize(destination) != entry.size:
+        return False
+    return not verify_checksums or _sha256(destination) == entry.sha256
+
+
+def _fetch_document(
+    session: requests.Session, url: str, entry: Optional[_ManifestEntry], verify_checksums: bool
+) -> Optional[_ManifestEntry]:
+    destination = _destination(url)
+    if _is_valid(entry, destination, verify_checksums):
+        return None
+    if entry is None and os.path.exists(destination):  # Downloaded before the manifest existed
+        return _ManifestEntry(url, None, os.path.getsize(destination), _sha256(destination))
+    return _download_from_mirrors(session, url)
+
+
+def _load_manifest() -> Dict[str, _ManifestEntry]:
+    """Load the manifest, rewriting it without lines truncated by an interrupted run.
+
+    Appending to a manifest ending with a truncated line would merge the next entry into it.
+    """
+    if not os.path.exists(_MANIFEST_FILENAME):
+        return {}
+    entries: Dict[str, _ManifestEntry] = {}
+    with open(_MANIFEST_FILENAME) as file_:
+        for line in file_:
+            try:
+                entry = _ManifestEntry(**json.loads(line))
+            except (ValueError, TypeError):
+                continue  # Line truncated by an interrupted run, the document is checked again
+            entries[entry.url] = entry
+    with open(_MANIFEST_FILENAME + '.tmp', 'w') as file_:
+        file_.writelines(json.dumps(asdict(entry)) + '\n' for entry in entries.values())
+    os.replace(_MANIFEST_FILENAME + '.tmp', _MANIFEST_FILENAME)
+    return entries
+
+
+def _build_session(max_workers: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=len(_MIRRORS), pool_maxsize=max_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def mirror_documents(
+    documents: List[Document], max_workers: int = _DEFAULT_MAX_WORKERS, verify_checksums: bool = False
+) -> None:
+    """Download documents in DOCUMENTS_FOLDER and record them in the manifest.
 
+    Files already recorded in the manifest with the right size are skipped (and with the
+    right checksum if `verify_checksums` is True), partial files are resumed.
 
-def _download_document(url: str) -> None:
-    full_url = CQUEST_URL + '/' + url
-    destination = DOCUMENTS_FOLDER + '/' + url.replace('/', '_')
-    found = _download_file_if_doesnt_exist(full_url, destination)
-    if not found:
-        print('Not found, attempting georisques.')
-        source_georisques = GEORISQUES_DOWNLOAD_URL + '/' + url
-        _download_file_if_doesnt_exist(source_georisques, destination)
+    Args:
+        documents (List[Document]): documents to download.
+        max_workers (int, optional): number of concurrent downloads. Defaults to 8.
+        verify_checksums (bool, optional): recompute checksums of existing files. Defaults to False.
+    """
+    os.makedirs(DOCUMENTS_FOLDER, exist_ok=True)
+    manifest = _load_manifest()
+    session = _build_session(max_workers)
+    urls = sorted({doc.url_doc for doc in documents})
+    errors: List[str] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, open(_MANIFEST_FILENAME, 'a') as manifest_file:
+        futures = {
+            executor.submit(_fetch_document, session, url, manifest.get(url), verify_checksums): url for url in urls
+        }
+        for future in tqdm(as_completed(futures), 'Downloading documents.', total=len(futures), bar_format=_BAR_FORMAT):
+            try:
+                entry = future.result()
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(futures[future])
+                print(futures[future], str(exc))
+                continue
+            if entry:
+                manifest_file.write(json.dumps(asdict(entry)) + '\n')
+                manifest_file.flush()
+    print(f'{len(urls) - len(errors)}/{len(urls)} documents are mirrored in {DOCUMENTS_FOLDER}.')
 
 
-def _download_documents(documents: List[Document]) -> None:
-    for doc in tqdm(documents, 'Downloading documents.', bar_format=_BAR_FORMAT):
-        _download_document(doc.url_doc)
+def cli() -> None:
+    parser = argparse.ArgumentParser(description='Download AP documents from cquest or Georisques')
+    parser.add_argument('--mirror-all', action='store_true', help='Download all AP instead of a random sample')
+    parser.add_argument('--max-workers', type=int, default=_DEFAULT_MAX_WORKERS, help='Number of concurrent downloads')
+    parser.add_argument('--verify-checksums', action='store_true', help='Check checksums of already downloaded files')
+    args = parser.parse_args()
+    all_docs = [doc for doc in load_documents_from_csv('all') if doc.type == DocumentType.AP]
+    documents = all_docs if args.mirror_all else random.sample(all_docs, 100)
+    mirror_documents(documents, args.max_workers, args.verify_checksums)
 
 
 if __name__ == '__main__':
-    ALL_DOCS = [doc for doc in load_documents_from_csv('all') if doc.type == DocumentType.AP]
-    _download_documents(random.sample(ALL_DOCS, 100))
+    cli()
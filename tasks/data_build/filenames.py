@@ -4,9 +4,21 @@ from typing import Literal
 from tasks.data_build.config import SECRET_DATA_FOLDER, SEED_FOLDER
 
 ENRICHED_OUTPUT_FOLDER = os.path.join(SEED_FOLDER, 'ams')
+AM_STORE_FILENAME = os.path.join(SEED_FOLDER, 'ams.store')
+PARAMETRIZATIONS_FILENAME = os.path.join(SEED_FOLDER, 'parametrizations.json')
+PARAMETER_INDEX_FILENAME = os.path.join(SEED_FOLDER, 'parameter_index.json')
 Dataset = Literal['all', 'idf', 'sample']
-DataType = Literal['classements', 'installations', 'documents', 'aps']
-Extension = Literal['csv', 'json']
+DataType = Literal[
+    'classements',
+    'installations',
+    'documents',
+    'aps',
+    'installation_ams',
+    'applicability_matrix',
+    'am_id_to_nb_classements',
+    'am_id_to_nb_classements_by_region',
+]
+Extension = Literal['csv', 'json', 'jsonl', 'npz']
 
 
 def dataset_object_name(dataset: Dataset, datatype: DataType, extension: Extension = 'csv') -> str:
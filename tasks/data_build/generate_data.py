@@ -13,44 +13,35 @@ _set_environment_variables()
 import argparse  # noqa: E402
 
 from tasks.data_build.build import from_georisques, from_s3ic  # noqa: E402
-from tasks.data_build.build.build_am_repository import generate_am_repository  # noqa: E402
-from tasks.data_build.build.build_ams import generate_ams  # noqa: E402
+from tasks.data_build.build.build_am_occurrences import build_am_occurrences  # noqa: E402
+from tasks.data_build.build.build_applicability_matrix import build_and_dump_applicability_matrix  # noqa: E402
 from tasks.data_build.build.build_aps import dump_ap_datasets  # noqa: E402
+from tasks.data_build.build.build_installation_ams import build_all_installation_ams_datasets  # noqa: E402
+from tasks.data_build.build.enriched_ams import generate_enriched_ams  # noqa: E402
 from tasks.data_build.validate.check_am import check_ams  # noqa: E402
-from tasks.data_build.validate.check_classements import check_classements_csv  # noqa: E402
-from tasks.data_build.validate.check_documents import check_documents_csv  # noqa: E402
-from tasks.data_build.validate.check_installations import check_installations_csv  # noqa: E402
 from tasks.ocr_ap.ocr_ap import run as run_ocr  # noqa: E402
 
 
 def _build_aps_from_georisques():
     from_georisques.build_all_documents()
     from_georisques.build_all_documents_datasets()
-    dump_ap_datasets()
-    check_documents_csv()
+    dump_ap_datasets()  # APs are checked before being uploaded
 
 
 def _build_installations_data():
+    # Installations and classements are checked before being uploaded
     from_s3ic.build_installations_csv()
     from_s3ic.build_all_installations_datasets()
     from_s3ic.build_classements_csv()
     from_s3ic.build_all_classement_datasets()
 
 
-def _check_installations_data():
-    check_classements_csv()
-    check_installations_csv()
-
-
 def _handle_installations_data():
     _build_installations_data()
-    _check_installations_data()
 
 
-def _handle_ams(with_repository: bool) -> None:
-    generate_ams()
-    if with_repository:
-        generate_am_repository()
+def _handle_ams(with_repository: bool, incremental: bool) -> None:
+    generate_enriched_ams(with_repository, incremental)
     check_ams()
 
 
@@ -61,18 +52,28 @@ def _handle_ocr() -> None:
 def run(
     with_repository: bool = False,
     handle_ams: bool = False,
+    incremental: bool = False,
     handle_installations_data: bool = False,
     handle_aps: bool = False,
     handle_ocr: bool = False,
+    handle_installation_ams: bool = False,
+    handle_applicability_matrix: bool = False,
+    handle_am_occurrences: bool = False,
 ) -> None:
     if handle_ams:
-        _handle_ams(with_repository)
+        _handle_ams(with_repository, incremental)
     if handle_installations_data:
         _handle_installations_data()
     if handle_aps:
         _build_aps_from_georisques()
     if handle_ocr:
         _handle_ocr()
+    if handle_installation_ams:
+        build_all_installation_ams_datasets()
+    if handle_applicability_matrix:
+        build_and_dump_applicability_matrix()
+    if handle_am_occurrences:
+        build_am_occurrences()
     print('✅ Operation is successful')
 
 
@@ -80,12 +81,32 @@ def cli():
     parser = argparse.ArgumentParser(description='Build data for envinorma-web')
     parser.add_argument('--with-repository', action='store_true', help='Generate AM repository')
     parser.add_argument('--handle-ams', action='store_true', help='Generate AMs')
+    parser.add_argument('--incremental', action='store_true', help='Only regenerate AMs whose inputs changed')
     parser.add_argument('--handle-installations-data', action='store_true', help='Generate installation data')
     parser.add_argument('--handle-aps', action='store_true', help='Generate APs')
     parser.add_argument('--handle-ocr', action='store_true', help='Perform OCR')
+    parser.add_argument(
+        '--handle-installation-ams', action='store_true', help='Generate applicable AMs of all installations'
+    )
+    parser.add_argument(
+        '--handle-applicability-matrix', action='store_true', help='Generate section applicability of all installations'
+    )
+    parser.add_argument(
+        '--handle-am-occurrences', action='store_true', help='Count classements of all installations per AM'
+    )
     args = parser.parse_args()
 
-    run(args.with_repository, args.handle_ams, args.handle_installations_data, args.handle_aps, args.handle_ocr)
+    run(
+        args.with_repository,
+        args.handle_ams,
+        args.incremental,
+        args.handle_installations_data,
+        args.handle_aps,
+        args.handle_ocr,
+        args.handle_installation_ams,
+        args.handle_applicability_matrix,
+        args.handle_am_occurrences,
+    )
 
 
 if __name__ == '__main__':
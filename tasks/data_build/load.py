@@ -1,6 +1,10 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import date
-from typing import Any, Dict, List, Optional, Set, cast
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Literal, Optional, Set, Tuple, Union, cast
 
 import pandas
 import pandas as pd
@@ -9,13 +13,22 @@ from envinorma.models.am_metadata import AMMetadata
 from envinorma.models.arrete_ministeriel import ArreteMinisteriel
 from envinorma.models.document import Document, DocumentType
 from envinorma.models.installation import ActivityStatus, Installation, InstallationFamily, Seveso
-from envinorma.utils import ensure_not_none
+from envinorma.parametrization import Parametrization
+from psycopg2.extensions import connection
+from psycopg2.pool import ThreadedConnectionPool
 
+from tasks.common import fast_json
 from tasks.common.config import DATA_FETCHER
 from tasks.common.ovh import load_from_ovh
-from tasks.data_build.filenames import Dataset, dataset_object_name
+from tasks.data_build.am_store import AMStore
+from tasks.data_build.filenames import AM_STORE_FILENAME, Dataset, dataset_object_name
 from tasks.data_build.utils import typed_tqdm
 
+_Table = Literal['structured_am', 'parametrization', 'am_metadata']
+_MAX_CONNECTIONS = 3
+_BATCH_SIZE = 500
+_STREAMING_ITERSIZE = 100
+
 
 def _load_csv(filename: str) -> pd.DataFrame:
     return pd.read_csv(filename, dtype='str')
@@ -62,7 +75,7 @@ def _dataframe_record_to_classement(record: Dict[str, Any]) -> DetailedClassemen
     return DetailedClassement(**record)
 
 
-def _load_classements(filename: str) -> List[DetailedClassement]:
+def load_classements_from_csv(filename: str) -> List[DetailedClassement]:
     dataframe_with_nan = pandas.read_csv(filename, dtype='str', na_values=None)
     dataframe = dataframe_with_nan.where(pandas.notnull(dataframe_with_nan), None)
     dataframe['volume'] = dataframe.volume.apply(lambda x: x or '')
@@ -73,7 +86,7 @@ def _load_classements(filename: str) -> List[DetailedClassement]:
 
 
 def load_classements(dataset: Dataset) -> List[DetailedClassement]:
-    return load_from_ovh(dataset_object_name(dataset, 'classements'), 'misc', _load_classements)
+    return load_from_ovh(dataset_object_name(dataset, 'classements'), 'misc', load_classements_from_csv)
 
 
 def _load_documents(filename: str) -> List[Document]:
@@ -111,6 +124,105 @@ def load_am_metadata() -> Dict[str, AMMetadata]:
     return {id_: md for id_, md in DATA_FETCHER.load_all_am_metadata().items() if not id_.startswith('FAKE')}
 
 
+@lru_cache
+def _connection_pool() -> ThreadedConnectionPool:
+    return ThreadedConnectionPool(1, _MAX_CONNECTIONS, DATA_FETCHER.psql_dsn)
+
+
+@contextmanager
+def _pooled_connection() -> Iterator[connection]:
+    pool = _connection_pool()
+    connection_ = pool.getconn()
+    try:
+        yield connection_
+    finally:
+        connection_.rollback()  # Read only, ends the transaction opened by the queries
+        pool.putconn(connection_)
+
+
+def _parse(data: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return data if isinstance(data, dict) else fast_json.loads(data)
+
+
+def _select_by_ids(table: _Table, ids: Set[str]) -> Dict[str, Dict[str, Any]]:
+    sorted_ids = sorted(ids)
+    rows: Dict[str, Dict[str, Any]] = {}
+    with _pooled_connection() as connection_, connection_.cursor() as cursor:
+        for start in range(0, len(sorted_ids), _BATCH_SIZE):
+            batch = tuple(sorted_ids[start : start + _BATCH_SIZE])
+            cursor.execute(f'SELECT am_id, data FROM {table} WHERE am_id IN %s', (batch,))
+            rows.update({am_id: _parse(data) for am_id, data in cursor.fetchall()})
+    return rows
+
+
+def _stream_table(table: _Table) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    with _pooled_connection() as connection_, connection_.cursor(name=f'stream_{table}') as cursor:
+        cursor.itersize = _STREAMING_ITERSIZE  # Rows fetched per round trip by the server-side cursor
+        cursor.execute(f'SELECT am_id, data FROM {table}')
+        for am_id, data in cursor:
+            yield am_id, _parse(data)
+
+
+def _load_table(table: _Table, ids: Optional[Set[str]]) -> Dict[str, Dict[str, Any]]:
+    if ids is None:
+        return dict(_stream_table(table))
+    return _select_by_ids(table, ids)
+
+
+def _load_metadata(ids: Optional[Set[str]]) -> Dict[str, AMMetadata]:
+    if ids is None:
+        return DATA_FETCHER.load_all_am_metadata()
+    return {am_id: AMMetadata.from_dict(data) for am_id, data in _select_by_ids('am_metadata', ids).items()}
+
+
+def _to_am(am_id: str, ams: Dict[str, Dict[str, Any]]) -> ArreteMinisteriel:
+    return ArreteMinisteriel.from_dict(ams[am_id]) if am_id in ams else DATA_FETCHER.safe_load_am(am_id)
+
+
+def _to_parametrization(am_id: str, parametrizations: Dict[str, Dict[str, Any]]) -> Parametrization:
+    if am_id in parametrizations:
+        return Parametrization.from_dict(parametrizations[am_id])
+    return DATA_FETCHER.load_or_init_parametrization(am_id)
+
+
+def stream_ams() -> Iterator[Tuple[str, ArreteMinisteriel]]:
+    """Stream all structured AMs of the database with a server-side cursor, without loading them all in memory."""
+    for am_id, data in _stream_table('structured_am'):
+        yield am_id, ArreteMinisteriel.from_dict(data)
+
+
+@dataclass
+class AMInputs:
+    am: ArreteMinisteriel
+    parametrization: Parametrization
+    metadata: AMMetadata
+
+
+def load_am_inputs(ids: Optional[Set[str]] = None) -> Dict[str, AMInputs]:
+    """Load AMs with their parametrization and metadata, in a few concurrent queries on pooled connections.
+
+    AMs without structured version or without parametrization are completed with
+    DATA_FETCHER.safe_load_am and DATA_FETCHER.load_or_init_parametrization.
+
+    Args:
+        ids (Optional[Set[str]], optional): Set of ids to load. Defaults to None, loading the AMs of
+            DATA_FETCHER.load_all_am_metadata with server-side cursors.
+
+    Returns:
+        Dict[str, AMInputs]: Dict mapping am_id to the AM, its parametrization and its metadata.
+    """
+    with ThreadPoolExecutor(max_workers=_MAX_CONNECTIONS) as executor:
+        metadata_future = executor.submit(_load_metadata, ids)
+        ams_future = executor.submit(_load_table, 'structured_am', ids)
+        parametrizations_future = executor.submit(_load_table, 'parametrization', ids)
+        metadata, ams = metadata_future.result(), ams_future.result()
+        parametrizations = parametrizations_future.result()
+    return {
+        am_id: AMInputs(_to_am(am_id, ams), _to_parametrization(am_id, parametrizations), md)
+        for am_id, md in metadata.items()
+    }
+
+
 def load_ams(ids: Optional[Set[str]] = None) -> Dict[str, ArreteMinisteriel]:
     """Load all ams or specify a set of am ids to load.
 
@@ -121,6 +233,24 @@ def load_ams(ids: Optional[Set[str]] = None) -> Dict[str, ArreteMinisteriel]:
         Dict[str, ArreteMinisteriel]: Dict mapping am_id to the corresponding AM.
     """
     logging.info('loading AM.')
-    ids = ids or set(list(DATA_FETCHER.load_all_am_metadata().keys()))
-    ams = DATA_FETCHER.load_id_to_am(ids)
-    return {id_: ensure_not_none(ams.get(id_)) for id_ in ids}
+    if ids:
+        ams = _select_by_ids('structured_am', ids)
+    else:
+        ids = set(DATA_FETCHER.load_all_am_metadata().keys())
+        ams = _load_table('structured_am', None)
+    return {id_: _to_am(id_, ams) for id_ in ids}
+
+
+def load_ams_from_store(ids: Optional[Set[str]] = None) -> Dict[str, ArreteMinisteriel]:
+    """Load enriched AMs from the AM store built with the AMs, without querying the database.
+
+    Args:
+        ids (Optional[Set[str]], optional): Set of ids to load. Defaults to None, loading all AMs.
+
+    Returns:
+        Dict[str, ArreteMinisteriel]: Dict mapping am_id to the corresponding enriched AM.
+    """
+    with AMStore(AM_STORE_FILENAME) as store:
+        if ids is None:
+            return dict(typed_tqdm(store.items(), 'Loading AMs', leave=False))
+        return {id_: store.load(id_) for id_ in ids}
@@ -1,3 +1,13 @@
+'''
+Upload the AM repository in OVH, as a full archive or as a delta archive.
+
+Archives are streamed into OVH while being compressed. A manifest lists the archives to
+extract in order (one full archive followed by delta archives, each delta listing the files
+it deletes) and the hash of each file of the latest state, see download_am_repository.
+A stream cannot be rewound, so a failed upload is retried with a newly generated archive.
+'''
+
+
 def _set_environment_variables() -> None:
     # To keep above OVH import to ensure env vars are set correctly
     from ..common.config import PSQL_DSN  # noqa: F401
@@ -5,35 +15,166 @@ def _set_environment_variables() -> None:
 
 _set_environment_variables()
 
-import shutil  # noqa: E402
-import tempfile  # noqa: E402
+import argparse  # noqa: E402
+import hashlib  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import zipfile  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+from contextlib import suppress  # noqa: E402
+from dataclasses import asdict, dataclass, field  # noqa: E402
 from datetime import datetime  # noqa: E402
+from typing import Any, Dict, List, Optional, Tuple  # noqa: E402
 
-from ..common.ovh import BucketName, OVHClient  # noqa: E402
-from .build.build_am_repository import generate_am_repository  # noqa: E402
-from .build.build_ams import generate_ams  # noqa: E402
+from ..common.ovh import BucketName, OVHClient, dump_in_ovh, load_from_ovh  # noqa: E402
+from ..common.streaming_zip import write_zip  # noqa: E402
+from .build.enriched_ams import generate_enriched_ams  # noqa: E402
 from .config import AM_REPOSITORY_FOLDER  # noqa: E402
 from .validate.check_am import check_ams  # noqa: E402
 
 _AM_BUCKET: BucketName = 'am'
+_MANIFEST_NAME = 'data/manifest.json'
+_EXCLUDED_FOLDERS = {'.git'}
+_NB_UPLOAD_ATTEMPTS = 3
+
+
+@dataclass
+class _Archive:
+    name: str
+    deleted: List[str] = field(default_factory=list)  # files of the previous state absent from this one
+
+
+@dataclass
+class _Manifest:
+    archives: List[_Archive]  # a full archive followed by delta archives
+    files: Dict[str, str]  # sha256 of each file of the latest state, by path in archive
+
+    @classmethod
+    def from_dict(cls, dict_: Dict[str, Any]) -> '_Manifest':
+        return cls([_Archive(**archive) for archive in dict_['archives']], dict_['files'])
+
+
+def _remote_filename(delta: bool) -> str:
+    return f'data/{datetime.now().isoformat()}{"-delta" if delta else ""}.zip'
+
+
+def _sha256(filename: str) -> str:
+    with open(filename, 'rb') as file_:
+        return hashlib.sha256(file_.read()).hexdigest()
+
+
+def _repository_files() -> Dict[str, str]:
+    files: Dict[str, str] = {}
+    for root, folders, filenames in os.walk(AM_REPOSITORY_FOLDER):
+        folders[:] = sorted(folder for folder in folders if folder not in _EXCLUDED_FOLDERS)
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            files[os.path.relpath(path, AM_REPOSITORY_FOLDER)] = _sha256(path)
+    return files
+
+
+def _read_manifest(filename: str) -> _Manifest:
+    with open(filename) as file_:
+        return _Manifest.from_dict(json.load(file_))
+
+
+def _load_manifest() -> Optional[_Manifest]:
+    if not OVHClient.file_exists(_MANIFEST_NAME, _AM_BUCKET):
+        return None
+    return load_from_ovh(_MANIFEST_NAME, _AM_BUCKET, _read_manifest)
+
+
+def _dump_manifest(manifest: _Manifest) -> None:
+    def _dumper(filename: str) -> None:
+        with open(filename, 'w') as file_:
+            json.dump(asdict(manifest), file_, indent=2)
+
+    dump_in_ovh(_MANIFEST_NAME, _AM_BUCKET, _dumper)
+
+
+def _write_zip_and_close(files: List[Tuple[str, str]], write_fd: int) -> None:
+    with os.fdopen(write_fd, 'wb') as stream:
+        write_zip(stream, files)
+
+
+def _stream_zip(files: List[Tuple[str, str]], remote_filename: str) -> None:
+    read_fd, write_fd = os.pipe()
+    # If the upload fails, the read end is closed first so that the writer does not block forever.
+    with ThreadPoolExecutor(max_workers=1) as executor, os.fdopen(read_fd, 'rb') as reader:
+        writing = executor.submit(_write_zip_and_close, files, write_fd)
+        OVHClient.upload_stream(_AM_BUCKET, reader, remote_filename)
+    writing.result()  # Archive is only referenced in the manifest if it was fully written
+
+
+def _upload_zip(paths: List[str], remote_filename: str) -> None:
+    files = [(os.path.join(AM_REPOSITORY_FOLDER, path), path) for path in sorted(paths)]
+    for attempt in range(1, _NB_UPLOAD_ATTEMPTS + 1):
+        try:
+            _stream_zip(files, remote_filename)
+            return
+        except Exception as exc:  # pylint: disable=broad-except
+            if attempt == _NB_UPLOAD_ATTEMPTS:
+                raise
+            print(f'Upload of {remote_filename} failed ({exc}), retrying with a new archive stream.')
+
+
+def _upload_full_archive(files: Dict[str, str]) -> _Manifest:
+    remote_filename = _remote_filename(delta=False)
+    _upload_zip(list(files), remote_filename)
+    return _Manifest([_Archive(remote_filename)], files)
+
+
+def _upload_delta_archive(files: Dict[str, str], previous: _Manifest) -> Optional[_Manifest]:
+    changed = [path for path, hash_ in files.items() if previous.files.get(path) != hash_]
+    deleted = sorted(set(previous.files) - set(files))
+    if not changed and not deleted:
+        return None
+    remote_filename = _remote_filename(delta=True)
+    _upload_zip(changed, remote_filename)
+    print(f'Uploaded delta archive with {len(changed)} changed files and {len(deleted)} deleted files.')
+    return _Manifest(previous.archives + [_Archive(remote_filename, deleted)], files)
+
+
+def upload_am_repository(delta: bool = False) -> None:
+    """Upload the AM repository in OVH and update the manifest.
+
+    Args:
+        delta (bool, optional): only upload files changed since the previous upload. Falls back
+            on a full archive if there is no manifest yet. Defaults to False.
+    """
+    files = _repository_files()
+    previous = _load_manifest() if delta else None
+    manifest = _upload_delta_archive(files, previous) if previous else _upload_full_archive(files)
+    if manifest is None:
+        print('AM repository did not change since previous upload.')
+        return
+    _dump_manifest(manifest)
 
 
-def _upload_to_ovh(local_filename: str, remote_filename: str) -> None:
-    OVHClient.upload_document(_AM_BUCKET, local_filename, remote_filename)
+def _extract(archive_filename: str, destination: str) -> None:
+    with zipfile.ZipFile(archive_filename) as archive:
+        archive.extractall(destination)
 
 
-def _remote_filename() -> str:
-    return f'data/{datetime.now().isoformat()}.zip'
+def download_am_repository(destination: str) -> None:
+    """Rebuild the latest state of the AM repository in destination from the archives listed in the manifest."""
+    manifest = _load_manifest()
+    if manifest is None:
+        raise ValueError(f'No manifest found in bucket {_AM_BUCKET}.')
+    for archive in manifest.archives:
+        load_from_ovh(archive.name, _AM_BUCKET, lambda filename: _extract(filename, destination))
+        for path in archive.deleted:
+            with suppress(FileNotFoundError):  # Already absent from destination
+                os.remove(os.path.join(destination, path))
 
 
-def load_ams_in_ovh() -> None:
-    generate_ams()
-    generate_am_repository()
+def load_ams_in_ovh(delta: bool = False) -> None:
+    generate_enriched_ams(with_repository=True)
     check_ams()
-    with tempfile.NamedTemporaryFile('w', prefix='am-repo') as file_:
-        shutil.make_archive(file_.name, 'zip', AM_REPOSITORY_FOLDER)
-        _upload_to_ovh(f'{file_.name}.zip', _remote_filename())
+    upload_am_repository(delta)
 
 
 if __name__ == '__main__':
-    load_ams_in_ovh()
+    parser = argparse.ArgumentParser(description='Generate the AM repository and upload it in OVH')
+    parser.add_argument('--delta', action='store_true', help='Only upload AMs changed since the previous upload')
+    load_ams_in_ovh(parser.parse_args().delta)
@@ -1,11 +1,120 @@
-from typing import Iterable, Optional, TypeVar
+import ctypes
+import errno
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, TypeVar
 
 from tqdm import tqdm
 
 T = TypeVar('T')
+_NB_KEPT_VERSIONS = 2
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
 
 
 def typed_tqdm(
     collection: Iterable[T], desc: Optional[str] = None, leave: bool = True, disable: bool = False
 ) -> Iterable[T]:
     return tqdm(collection, desc=desc, leave=leave, disable=disable)
+
+
+def _fill_staging_folder(staging: str, folder: str, keep_content: bool) -> None:
+    if keep_content and os.path.exists(folder):
+        # Files are copied and not hard-linked: writers truncate files in place.
+        shutil.copytree(folder, staging, dirs_exist_ok=True)
+
+
+def _remove_old_versions(versions_folder: str) -> None:
+    versions = sorted(os.listdir(versions_folder))  # Names start with their creation date
+    for version in versions[:-_NB_KEPT_VERSIONS]:
+        shutil.rmtree(os.path.join(versions_folder, version), ignore_errors=True)
+
+
+def _make_version_folder(versions_folder: str, prefix: str) -> str:
+    folder = tempfile.mkdtemp(dir=versions_folder, prefix=prefix)
+    os.chmod(folder, 0o755)  # mkdtemp creates folders readable by their owner only
+    return folder
+
+
+def _flip_symlink(folder: str, target: str) -> None:
+    if os.path.isdir(folder) and not os.path.islink(folder):  # Plain directory written by a previous version
+        os.rename(folder, _make_version_folder(os.path.dirname(target), '0-legacy-'))
+    link = target + '.link'
+    os.symlink(os.path.abspath(target), link)
+    os.replace(link, folder)
+
+
+@contextmanager
+def staged_symlinked_folder(folder: str, keep_content: bool = False) -> Iterator[str]:
+    """Yield a staging folder that atomically replaces `folder` when the block exits without error.
+
+    `folder` is a symlink to the current version, stored in `<folder>_versions`. Once the staging
+    folder is written, the symlink is flipped with a rename: readers see either the previous or
+    the new version, never a partial one. The previous version is kept for readers still using it.
+
+    Args:
+        folder (str): path of the symlink readers use.
+        keep_content (bool, optional): start from a copy of the current version. Defaults to False.
+    """
+    versions_folder = folder.rstrip('/') + '_versions'
+    os.makedirs(versions_folder, exist_ok=True)
+    staging = _make_version_folder(versions_folder, datetime.now().strftime('%Y%m%d%H%M%S%f-'))
+    try:
+        _fill_staging_folder(staging, folder, keep_content)
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _flip_symlink(folder, staging)
+    _remove_old_versions(versions_folder)
+
+
+def _exchange(first: str, second: str) -> bool:
+    """Atomically swap two existing paths with renameat2, returning False where it is not supported."""
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError, TypeError):  # glibc < 2.28, or not Linux
+        return False
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    if renameat2(_AT_FDCWD, os.fsencode(first), _AT_FDCWD, os.fsencode(second), _RENAME_EXCHANGE) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.ENOSYS, errno.EINVAL):  # Kernel or filesystem without RENAME_EXCHANGE
+        return False
+    raise OSError(error, os.strerror(error), first)
+
+
+@contextmanager
+def staged_folder(folder: str, staging: str, keep_content: bool = False) -> Iterator[str]:
+    """Yield `staging`, which replaces `folder` when the block exits without error.
+
+    To be used when `folder` cannot be a symlink, for instance in a git repository. Until the block
+    exits, `folder` is left untouched, so an interrupted generation does not alter it. Both folders
+    are then exchanged atomically with renameat2(RENAME_EXCHANGE). Where it is not supported, the
+    swap falls back to two renames, between which `folder` does not exist.
+
+    Args:
+        folder (str): folder to replace.
+        staging (str): staging folder, on the same filesystem as `folder`, outside of any repository.
+        keep_content (bool, optional): start from a copy of `folder`. Defaults to False.
+    """
+    shutil.rmtree(staging, ignore_errors=True)  # Left by an interrupted generation
+    os.makedirs(staging)
+    try:
+        _fill_staging_folder(staging, folder, keep_content)
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if os.path.exists(folder) and _exchange(staging, folder):
+        shutil.rmtree(staging)  # Now holds the previous content
+        return
+    previous = staging.rstrip('/') + '_previous'
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(folder):
+        os.rename(folder, previous)
+    os.rename(staging, folder)
+    shutil.rmtree(previous, ignore_errors=True)
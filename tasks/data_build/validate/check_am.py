@@ -1,24 +1,68 @@
-import json
 import os
-from typing import Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set
 
 from envinorma.models import ArreteMinisteriel
 from envinorma.models.validate_am import check_am
 from envinorma.utils import typed_tqdm
 
-from ..filenames import ENRICHED_OUTPUT_FOLDER
+from ...common import fast_json
+from ..am_store import AMStore
+from ..filenames import AM_STORE_FILENAME, ENRICHED_OUTPUT_FOLDER
 
+_STORE: Optional[AMStore] = None  # Opened once in each worker process, if the store exists
 
-def _load_enriched_am_list(enriched_output_folder: str) -> Dict[str, ArreteMinisteriel]:
-    return {
-        file_: ArreteMinisteriel.from_dict(json.load(open(os.path.join(enriched_output_folder, file_))))
-        for file_ in os.listdir(enriched_output_folder)
-    }
 
+def _open_store(filename: Optional[str]) -> None:
+    global _STORE
+    _STORE = AMStore(filename) if filename else None
 
-def check_ams() -> None:
-    ams = _load_enriched_am_list(ENRICHED_OUTPUT_FOLDER)
-    for filename, am in typed_tqdm(ams.items(), 'Checking AMs'):
-        filename_am_id = filename.split('.json')[0]
+
+def _check_am_file(filename: str) -> Optional[str]:
+    """Load and check one enriched AM, returning the error message if the AM is invalid."""
+    try:
+        with open(filename, 'rb') as file_:
+            content = file_.read()
+        am = ArreteMinisteriel.from_dict(fast_json.loads(content))
+        filename_am_id = os.path.basename(filename).split('.json')[0]
         assert filename_am_id == am.id, f'Filename {filename} does not match AM id {am.id}'
         check_am(am)
+        if _STORE is not None:
+            assert _STORE.load_serialized(am.id) == content, f'AM store content of {am.id} differs from {filename}'
+    except Exception as exc:  # pylint: disable=broad-except
+        return f'{type(exc).__name__}: {exc}'
+    return None
+
+
+def _check_store_matches_folder(store_filename: str, folder_ids: Set[str]) -> None:
+    with AMStore(store_filename) as store:
+        stored_ids = store.ids()
+    if folder_ids != stored_ids:
+        raise ValueError(
+            f'AM store and {ENRICHED_OUTPUT_FOLDER} differ: {sorted(folder_ids - stored_ids)} are not stored, '
+            f'{sorted(stored_ids - folder_ids)} are not in folder.'
+        )
+
+
+def check_ams(max_workers: Optional[int] = None) -> None:
+    """Check all enriched AMs of ENRICHED_OUTPUT_FOLDER in a process pool.
+
+    Each worker reads, deserializes and checks one file at a time, so memory does not depend
+    on the number of AMs. If AM_STORE_FILENAME exists, it must contain the same AMs as the
+    folder, with the same content: each worker memory-maps it once to compare. All failures
+    are collected before raising.
+
+    Args:
+        max_workers (Optional[int], optional): number of processes. Defaults to the number of CPUs.
+    """
+    filenames = sorted(os.path.join(ENRICHED_OUTPUT_FOLDER, file_) for file_ in os.listdir(ENRICHED_OUTPUT_FOLDER))
+    store_filename = AM_STORE_FILENAME if os.path.exists(AM_STORE_FILENAME) else None
+    if store_filename:
+        _check_store_matches_folder(store_filename, {os.path.basename(file_).split('.json')[0] for file_ in filenames})
+    initargs = (store_filename,)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_open_store, initargs=initargs) as executor:
+        results = typed_tqdm(executor.map(_check_am_file, filenames, chunksize=4), 'Checking AMs')
+        errors: Dict[str, str] = {filename: error for filename, error in zip(filenames, results) if error}
+    if errors:
+        details = '\n'.join(f'{filename}: {error}' for filename, error in errors.items())
+        raise ValueError(f'{len(errors)}/{len(filenames)} AMs are invalid:\n{details}')
@@ -1,78 +1,77 @@
-from typing import Any, Dict, List, Optional
+from typing import Set
 
 import pandas
-from envinorma.models import DetailedClassement, DetailedRegime
+from envinorma.models import DetailedClassementState, DetailedRegime
 
 from tasks.common.ovh import load_from_ovh
 
 from ..filenames import dataset_object_name
-
-
-def _is_47xx(rubrique: Optional[str]) -> bool:
-    if not rubrique:
-        return False
-    if rubrique[:2] == '47':
-        return True
-    return False
-
-
-def _is_4xxx(rubrique: Optional[str]) -> bool:
-    if not rubrique:
-        return False
-    if len(rubrique) == 4 and rubrique[:1] == '4':
-        return True
-    return False
-
-
-def _check_void(classement: DetailedClassement) -> None:
-    assert classement.rubrique == '47xx', classement
-    assert classement.regime == DetailedRegime.NC, classement
-    assert not classement.alinea, classement
-    assert not classement.date_autorisation, classement
-    assert classement.regime_acte == DetailedRegime.NC, classement
-    assert not classement.alinea_acte, classement
-    assert classement.rubrique_acte == '47xx', classement
-    assert not classement.activite, classement
-    assert classement.volume == '', classement
-    assert classement.unit == '', classement
-
-
-def _check_classement_is_safe(classement: DetailedClassement) -> None:
-    if _is_47xx(classement.rubrique):
-        _check_void(classement)
-    if _is_47xx(classement.rubrique_acte):
-        _check_void(classement)
-
-
-def _check_output(classements: List[DetailedClassement]) -> List[DetailedClassement]:
-    for classement in classements:
-        _check_classement_is_safe(classement)
-    return classements
-
-
-def _row_to_classement(record: Dict[str, Any]) -> DetailedClassement:
-    key_dates = ['date_autorisation', 'date_mise_en_service', 'last_substantial_modif_date']
-    for key in key_dates:
-        record[key] = record[key] or None
-    classement = DetailedClassement(**record)
-    simple_regimes = (
-        classement.regime.A,
-        classement.regime.E,
-        classement.regime.D,
-        classement.regime.NC,
-        classement.regime.UNKNOWN,
-    )
-    assert classement.regime in (simple_regimes)
-    assert classement.regime_acte in (simple_regimes)
-    return classement
+from ..load import load_installations_csv
+from .schema import S3IC_ID_REGEXP, Column, RowRule, Schema, as_csv_strings, load_csv_as_strings, validate_dataframe
+
+_SIMPLE_REGIMES = {
+    DetailedRegime.A.value,
+    DetailedRegime.E.value,
+    DetailedRegime.D.value,
+    DetailedRegime.NC.value,
+    DetailedRegime.UNKNOWN.value,
+}
+
+
+_VOID_47XX_VALUES = {
+    'rubrique': '47xx',
+    'regime': DetailedRegime.NC.value,
+    'alinea': '',
+    'date_autorisation': '',
+    'regime_acte': DetailedRegime.NC.value,
+    'alinea_acte': '',
+    'rubrique_acte': '47xx',
+    'activite': '',
+    'volume': '',
+    'unit': '',
+}
+
+
+def _47xx_rows_are_not_void(classements: pandas.DataFrame) -> pandas.Series:
+    is_47xx = (classements.rubrique.str[:2] == '47') | (classements.rubrique_acte.str[:2] == '47')
+    is_void = (classements[list(_VOID_47XX_VALUES)] == pandas.Series(_VOID_47XX_VALUES)).all(axis=1)
+    return is_47xx & ~is_void
+
+
+CLASSEMENTS_SCHEMA = Schema(
+    'classements',
+    [
+        Column('s3ic_id', nullable=False, regexp=S3IC_ID_REGEXP, foreign_key='installations'),
+        Column('rubrique', nullable=False),
+        Column('regime', nullable=False, domain=_SIMPLE_REGIMES),
+        Column('alinea'),
+        Column('date_autorisation', is_date=True),
+        Column('date_mise_en_service', is_date=True),
+        Column('last_substantial_modif_date', is_date=True),
+        Column('state', domain={state.value for state in DetailedClassementState}),
+        Column('regime_acte', domain=_SIMPLE_REGIMES),
+        Column('alinea_acte'),
+        Column('rubrique_acte'),
+        Column('activite'),
+        Column('volume'),
+        Column('unit'),
+    ],
+    [RowRule('47xx classements are not void', _47xx_rows_are_not_void)],
+)
+
+
+def _check_csv_dataframe(dataframe: pandas.DataFrame, installation_ids: Set[str]) -> None:
+    report = validate_dataframe(dataframe, CLASSEMENTS_SCHEMA, {'installations': installation_ids})
+    print(report)
+    report.raise_if_invalid()
+
+
+def check_classements_dataframe(classements: pandas.DataFrame, installation_ids: Set[str]) -> None:
+    """Check a classements dataframe before it is dumped, as it would be read from its CSV."""
+    _check_csv_dataframe(as_csv_strings(classements), installation_ids)
 
 
 def check_classements_csv() -> None:
     name = dataset_object_name('all', 'classements')
-    dataframe = load_from_ovh(
-        name,
-        'misc',
-        lambda filename: pandas.read_csv(filename, dtype='str', na_values=None, parse_dates=['date_autorisation']),
-    )
-    classements = [_row_to_classement(record) for record in dataframe.fillna('').to_dict(orient='records')]
-    _check_output(classements)
+    dataframe = load_from_ovh(name, 'misc', load_csv_as_strings)
+    _check_csv_dataframe(dataframe, set(load_installations_csv('all').s3ic_id))
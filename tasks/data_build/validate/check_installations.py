@@ -1,29 +1,38 @@
-from datetime import date
-from typing import Any, Dict, cast
+from dataclasses import fields
 
 import pandas
 from envinorma.models import Regime
 from envinorma.models.installation import ActivityStatus, Installation, InstallationFamily, Seveso
-from tqdm import tqdm
 
 from tasks.common.ovh import load_from_ovh
 
 from ..filenames import dataset_object_name
+from .schema import S3IC_ID_REGEXP, Column, Schema, as_csv_strings, load_csv_as_strings, validate_dataframe
 
+_CHECKED_COLUMNS = [
+    Column('s3ic_id', nullable=False, regexp=S3IC_ID_REGEXP),
+    Column('last_inspection', is_date=True),
+    Column('regime', domain={regime.value for regime in Regime}),
+    Column('seveso', nullable=False, domain={seveso.value for seveso in Seveso}),
+    Column('family', nullable=False, domain={family.value for family in InstallationFamily}),
+    Column('active', nullable=False, domain={status.value for status in ActivityStatus}),
+]
+_CHECKED_COLUMN_NAMES = {column.name for column in _CHECKED_COLUMNS}
+_OTHER_COLUMNS = [Column(field.name) for field in fields(Installation) if field.name not in _CHECKED_COLUMN_NAMES]
+INSTALLATIONS_SCHEMA = Schema('installations', _CHECKED_COLUMNS + _OTHER_COLUMNS)
 
-def _dataframe_record_to_installation(record: Dict[str, Any]) -> Installation:
-    record['last_inspection'] = date.fromisoformat(record['last_inspection']) if record['last_inspection'] else None
-    record['regime'] = Regime(record['regime']) if record['regime'] else None
-    record['seveso'] = Seveso(record['seveso'])
-    record['family'] = InstallationFamily(record['family'])
-    record['active'] = ActivityStatus(record['active'])
-    return Installation(**record)
+
+def _check_csv_dataframe(dataframe: pandas.DataFrame) -> None:
+    report = validate_dataframe(dataframe, INSTALLATIONS_SCHEMA)
+    print(report)
+    report.raise_if_invalid()
+
+
+def check_installations_dataframe(installations: pandas.DataFrame) -> None:
+    """Check an installations dataframe before it is dumped, as it would be read from its CSV."""
+    _check_csv_dataframe(as_csv_strings(installations))
 
 
 def check_installations_csv() -> None:
     name = dataset_object_name('all', 'installations')
-    dataframe = load_from_ovh(
-        name, 'misc', lambda filename: pandas.read_csv(filename, dtype='str', na_values=None).fillna('')
-    )
-    for record in tqdm(dataframe.to_dict(orient='records'), 'Checking installations csv'):
-        _dataframe_record_to_installation(cast(Dict, record))
+    _check_csv_dataframe(load_from_ovh(name, 'misc', load_csv_as_strings))
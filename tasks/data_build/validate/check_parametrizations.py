@@ -0,0 +1,107 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from envinorma.models import ArreteMinisteriel
+from envinorma.models.structured_text import StructuredText
+from envinorma.parametrization import Parametrization
+from envinorma.utils import ensure_not_none, typed_tqdm
+
+from ...regulation_engine.compiled_parametrization import compile_parametrization
+from ..am_store import AMStore, load_parametrizations
+from ..filenames import AM_STORE_FILENAME, PARAMETRIZATIONS_FILENAME
+
+_STORE: Optional[AMStore] = None  # Opened once in each worker process
+
+
+@dataclass
+class ParametrizationConflict:
+    am_id: str
+    section_id: str
+    section_path: List[str]  # Titles from the root section of the AM
+    conditions: List[Dict[str, Any]]  # Conditions of alternative sections that can apply simultaneously
+
+
+@dataclass
+class ParametrizationReport:
+    nb_ams: int
+    conflicts: List[ParametrizationConflict]
+    errors: Dict[str, str]  # AM id -> error message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _open_store(filename: str) -> None:
+    global _STORE
+    _STORE = AMStore(filename)
+
+
+def _sections_with_path(sections: List[StructuredText], path: List[str]) -> Iterator[Tuple[StructuredText, List[str]]]:
+    for section in sections:
+        section_path = [*path, section.title.text]
+        yield section, section_path
+        yield from _sections_with_path(section.sections, section_path)
+
+
+def _conflicts(am: ArreteMinisteriel, parametrization: Parametrization) -> List[ParametrizationConflict]:
+    paths = {section.id: path for section, path in _sections_with_path(am.sections, [])}
+    conflicts: Dict[str, ParametrizationConflict] = {}
+    for first, second in compile_parametrization(parametrization).conflicting_elements():
+        conflict = conflicts.setdefault(
+            first.section_id, ParametrizationConflict(am.id, first.section_id, paths.get(first.section_id, []), [])
+        )
+        for element in (first, second):
+            if element.condition.to_dict() not in conflict.conditions:
+                conflict.conditions.append(element.condition.to_dict())
+    for section, path in _sections_with_path(am.sections, []):  # Incompatibilities detected by envinorma only
+        if section.id not in conflicts and not section.parametrization_elements_are_compatible():
+            conflicts[section.id] = ParametrizationConflict(am.id, section.id, path, [])
+    return list(conflicts.values())
+
+
+def _check_stored_am(
+    am_id_and_parametrization: Tuple[str, Parametrization]
+) -> Tuple[List[ParametrizationConflict], Optional[str]]:
+    am_id, parametrization = am_id_and_parametrization
+    try:
+        return _conflicts(ensure_not_none(_STORE).load(am_id), parametrization), None
+    except Exception as exc:  # pylint: disable=broad-except
+        return [], f'{type(exc).__name__}: {exc}'
+
+
+def _has_elements(parametrization: Parametrization) -> bool:
+    return bool(parametrization.application_conditions or parametrization.alternative_sections)
+
+
+def check_parametrizations(max_workers: Optional[int] = None) -> ParametrizationReport:
+    """Find sections of enriched AMs with alternative sections that can apply simultaneously, in a process pool.
+
+    AMs are read from AM_STORE_FILENAME, each worker memory-mapping the store once, and their
+    parametrizations from PARAMETRIZATIONS_FILENAME, both written by generate_enriched_ams. Conflicts
+    are found on the compiled parametrization, which gives the conflicting conditions, and
+    completed with sections whose parametrization elements are incompatible for envinorma.
+
+    Args:
+        max_workers (Optional[int], optional): number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        ParametrizationReport: conflicting sections, and AMs that could not be checked.
+    """
+    with AMStore(AM_STORE_FILENAME) as store:
+        am_ids = sorted(store.ids())
+    parametrizations = load_parametrizations(PARAMETRIZATIONS_FILENAME)
+    am_ids = [am_id for am_id in am_ids if am_id in parametrizations and _has_elements(parametrizations[am_id])]
+    tasks = [(am_id, parametrizations[am_id]) for am_id in am_ids]
+    initargs = (AM_STORE_FILENAME,)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_open_store, initargs=initargs) as executor:
+        results = list(typed_tqdm(executor.map(_check_stored_am, tasks, chunksize=4), 'Checking parametrizations'))
+    conflicts = [conflict for am_conflicts, _ in results for conflict in am_conflicts]
+    errors = {am_id: error for am_id, (_, error) in zip(am_ids, results) if error}
+    return ParametrizationReport(len(am_ids), conflicts, errors)
+
+
+def dump_report(report: ParametrizationReport, filename: str) -> None:
+    with open(filename, 'w') as file_:
+        json.dump(report.to_dict(), file_, indent=2, ensure_ascii=False, default=str)
@@ -0,0 +1,141 @@
+'''Declarative column schemas for validating dataset CSVs column-wise.
+
+Dataframes are expected as loaded from the CSV files: all values are strings and missing
+values are empty strings. Every rule is evaluated on whole columns, and all violations are
+collected in a report instead of stopping at the first one.
+'''
+import io
+from dataclasses import dataclass, field
+from typing import IO, Callable, Dict, List, Optional, Set, Union
+
+import pandas
+
+DATE_FORMAT = '%Y-%m-%d'
+S3IC_ID_REGEXP = r'[0-9]{4}\.[0-9]{5}'
+_NB_EXAMPLES = 5
+
+
+@dataclass
+class Column:
+    name: str
+    nullable: bool = True
+    regexp: Optional[str] = None
+    domain: Optional[Set[str]] = None
+    is_date: bool = False
+    foreign_key: Optional[str] = None  # name of the set of references passed to validate_dataframe
+
+
+@dataclass
+class RowRule:
+    name: str
+    violations: Callable[[pandas.DataFrame], pandas.Series]  # returns a boolean mask of violating rows
+
+
+@dataclass
+class Schema:
+    name: str
+    columns: List[Column]
+    row_rules: List[RowRule] = field(default_factory=list)
+
+
+@dataclass
+class Violation:
+    rule: str
+    nb_rows: int
+    examples: List[str]
+
+
+@dataclass
+class ValidationReport:
+    schema_name: str
+    nb_rows: int
+    violations: List[Violation]
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.violations
+
+    def __str__(self) -> str:
+        if self.is_valid:
+            return f'{self.schema_name}: {self.nb_rows} rows, no violation.'
+        lines = [f'{self.schema_name}: {self.nb_rows} rows, {len(self.violations)} violated rules.']
+        for violation in self.violations:
+            lines.append(f'\t{violation.rule}: {violation.nb_rows} rows, e.g. {violation.examples}')
+        return '\n'.join(lines)
+
+    def raise_if_invalid(self) -> None:
+        if not self.is_valid:
+            raise ValueError(str(self))
+
+
+def _examples(values: pandas.Series) -> List[str]:
+    return [str(value) for value in values.drop_duplicates().head(_NB_EXAMPLES)]
+
+
+def _column_masks(column: Column, values: pandas.Series, references: Dict[str, Set[str]]) -> Dict[str, pandas.Series]:
+    filled = values != ''
+    masks: Dict[str, pandas.Series] = {}
+    if not column.nullable and not (column.domain and '' in column.domain):
+        masks['is empty'] = ~filled
+    if column.regexp is not None:
+        masks[f'does not match {column.regexp}'] = filled & ~values.str.fullmatch(column.regexp)
+    if column.domain is not None:
+        masks['is not in domain'] = filled & ~values.isin(column.domain)
+    if column.is_date:
+        parsed = pandas.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+        masks['is not a date'] = filled & parsed.isna()
+    if column.foreign_key is not None:
+        masks[f'is not in {column.foreign_key}'] = filled & ~values.isin(references[column.foreign_key])
+    return masks
+
+
+def _column_violations(column: Column, dataframe: pandas.DataFrame, references: Dict[str, Set[str]]) -> List[Violation]:
+    if column.name not in dataframe.columns:
+        return [Violation(f'column {column.name} is missing', len(dataframe), [])]
+    values = dataframe[column.name]
+    violations = []
+    for rule, mask in _column_masks(column, values, references).items():
+        nb_rows = int(mask.sum())
+        if nb_rows:
+            violations.append(Violation(f'{column.name} {rule}', nb_rows, _examples(values[mask])))
+    return violations
+
+
+def _row_rule_violations(rule: RowRule, dataframe: pandas.DataFrame) -> List[Violation]:
+    mask = rule.violations(dataframe)
+    nb_rows = int(mask.sum())
+    if not nb_rows:
+        return []
+    examples = [str(record) for record in dataframe[mask].head(_NB_EXAMPLES).to_dict(orient='records')]
+    return [Violation(rule.name, nb_rows, examples)]
+
+
+def validate_dataframe(
+    dataframe: pandas.DataFrame, schema: Schema, references: Optional[Dict[str, Set[str]]] = None
+) -> ValidationReport:
+    """Check all columns and row rules of a schema against a dataframe.
+
+    Args:
+        dataframe (pandas.DataFrame): dataframe of strings, empty strings standing for missing values.
+        schema (Schema): schema to check.
+        references (Optional[Dict[str, Set[str]]], optional): sets of ids targeted by foreign keys.
+
+    Returns:
+        ValidationReport: all violated rules with their number of rows and a few examples.
+    """
+    references = references or {}
+    violations = [
+        violation for column in schema.columns for violation in _column_violations(column, dataframe, references)
+    ]
+    if all(column.name in dataframe.columns for column in schema.columns):
+        violations.extend(violation for rule in schema.row_rules for violation in _row_rule_violations(rule, dataframe))
+    return ValidationReport(schema.name, len(dataframe), violations)
+
+
+def load_csv_as_strings(filename_or_buffer: Union[str, IO[str]]) -> pandas.DataFrame:
+    return pandas.read_csv(filename_or_buffer, dtype='str', na_values=None).fillna('')
+
+
+def as_csv_strings(dataframe: pandas.DataFrame) -> pandas.DataFrame:
+    """Convert an in-memory dataframe into what would be read back from its CSV dump."""
+    return load_csv_as_strings(io.StringIO(dataframe.to_csv(index=False)))
@@ -0,0 +1,39 @@
+'''
+Index of AMs by classement, to find the AMs applicable to an installation with hash lookups.
+
+An AM classement applies to an installation classement with the same rubrique and regime,
+and either the same alinea or no alinea at all. AMs are therefore bucketed by (rubrique, regime),
+then by alinea, AM classements without alinea going in the wildcard bucket.
+'''
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from envinorma.models import AMMetadata, DetailedClassement
+
+_WILDCARD: Optional[str] = None
+_Key = Tuple[str, str]  # (rubrique, regime value)
+
+
+class AMIndex:
+    def __init__(self, metadata: Dict[str, AMMetadata]) -> None:
+        self._buckets: Dict[_Key, Dict[Optional[str], Set[str]]] = {}
+        for am_id, md in metadata.items():
+            for classement in md.classements:
+                alinea_buckets = self._buckets.setdefault((classement.rubrique, classement.regime.value), {})
+                alinea_buckets.setdefault(classement.alinea or _WILDCARD, set()).add(am_id)
+
+    def applicable_am_ids(self, classement: DetailedClassement) -> Set[str]:
+        alinea_buckets = self._buckets.get((classement.rubrique, classement.regime.value))
+        if not alinea_buckets:
+            return set()
+        am_ids = set(alinea_buckets.get(_WILDCARD, ()))
+        if classement.alinea:
+            am_ids.update(alinea_buckets.get(classement.alinea, ()))
+        return am_ids
+
+    def group_by_am_id(self, classements: Iterable[DetailedClassement]) -> Dict[str, List[DetailedClassement]]:
+        """Group the classements of an installation by applicable AM id."""
+        groups: Dict[str, List[DetailedClassement]] = {}
+        for classement in classements:
+            for am_id in self.applicable_am_ids(classement):
+                groups.setdefault(am_id, []).append(classement)
+        return groups
@@ -0,0 +1,74 @@
+'''
+LRU cache of AMs with parameter values applied, shared by installations with equivalent values.
+
+Applying parameter values to an AM only depends on which conditions of its parametrization
+are satisfied, and on which of its parameters are unknown. Applied AMs are therefore keyed by
+the equivalence key of the compiled parametrization of the AM: parameter values satisfying the
+same conditions with the same unknown parameters share an entry.
+'''
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from envinorma.models import ArreteMinisteriel, Parameter
+from envinorma.parametrization import Parametrization
+from envinorma.parametrization.apply_parameter_values import apply_parameter_values_to_am
+
+from tasks.regulation_engine.compiled_parametrization import (
+    CompiledParametrization,
+    EquivalenceKey,
+    compile_parametrization,
+)
+
+_DEFAULT_MAX_SIZE = 1_000
+
+
+class AppliedAMCache:
+    def __init__(self, max_size: int = _DEFAULT_MAX_SIZE) -> None:
+        self.max_size = max_size
+        self.nb_hits = 0
+        self.nb_misses = 0
+        self._applied_ams: 'OrderedDict[Tuple[str, EquivalenceKey], ArreteMinisteriel]' = OrderedDict()
+        self._compiled_parametrizations: Dict[str, CompiledParametrization] = {}
+
+    def compiled_parametrization(self, am_id: str, parametrization: Parametrization) -> CompiledParametrization:
+        if am_id not in self._compiled_parametrizations:
+            self._compiled_parametrizations[am_id] = compile_parametrization(parametrization)
+        return self._compiled_parametrizations[am_id]
+
+    def apply(
+        self,
+        am_id: str,
+        am: ArreteMinisteriel,
+        parametrization: Parametrization,
+        parameter_values: Dict[Parameter, Any],
+    ) -> ArreteMinisteriel:
+        """Return apply_parameter_values_to_am(am, parameter_values, parametrization), from cache when possible.
+
+        The returned AM is shared between calls and must not be modified.
+        """
+        try:
+            key = (am_id, self.compiled_parametrization(am_id, parametrization).equivalence_key(parameter_values))
+        except TypeError:  # Values not comparable to the thresholds of the AM have no equivalence class
+            self.nb_misses += 1
+            return apply_parameter_values_to_am(am, parameter_values, parametrization)
+        if key in self._applied_ams:
+            self.nb_hits += 1
+            self._applied_ams.move_to_end(key)
+            return self._applied_ams[key]
+        self.nb_misses += 1
+        applied_am = apply_parameter_values_to_am(am, parameter_values, parametrization)
+        self._applied_ams[key] = applied_am
+        if len(self._applied_ams) > self.max_size:
+            self._applied_ams.popitem(last=False)
+        return applied_am
+
+    @property
+    def hit_rate(self) -> float:
+        nb_calls = self.nb_hits + self.nb_misses
+        return self.nb_hits / nb_calls if nb_calls else 0.0
+
+    def report(self) -> str:
+        return (
+            f'Applied AM cache: {self.nb_hits}/{self.nb_hits + self.nb_misses} hits ({self.hit_rate:.1%}), '
+            f'{len(self._applied_ams)}/{self.max_size} entries.'
+        )
@@ -0,0 +1,120 @@
+'''
+Evaluate the regulation engine for many installations at once.
+
+Installations are grouped by applicable AM, and each AM is loaded once. Installations of an AM
+are then grouped by the equivalence key of their parameter values on the compiled
+parametrization of the AM, so parameter values are applied once per distinct key instead
+of once per installation.
+'''
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from envinorma.models import ArreteMinisteriel, DetailedClassement, Parameter
+from envinorma.parametrization.apply_parameter_values import apply_parameter_values_to_am
+
+from tasks.data_build.load import AMInputs, load_am_inputs
+from tasks.data_build.utils import typed_tqdm
+from tasks.regulation_engine.am_index import AMIndex
+from tasks.regulation_engine.compiled_parametrization import EquivalenceKey, compile_parametrization
+from tasks.regulation_engine.parameters import known_parameter_dict
+
+
+@dataclass(frozen=True)
+class AMApplicability:
+    """Sections of an AM once the parameter values of an installation are applied."""
+
+    am_id: str
+    applicable_section_ids: Tuple[str, ...]
+    inapplicable_section_ids: Tuple[str, ...]
+    modified_section_ids: Tuple[str, ...]
+
+
+@dataclass
+class BatchResult:
+    applicability: Dict[str, Dict[str, AMApplicability]]  # s3ic_id -> am_id -> applicability
+    errors: Dict[str, Dict[str, str]]  # s3ic_id -> am_id -> error message
+
+
+def _am_applicability(am_id: str, applied_am: ArreteMinisteriel) -> AMApplicability:
+    applicable: List[str] = []
+    inapplicable: List[str] = []
+    modified: List[str] = []
+    for section in applied_am.descendent_sections():
+        applicability = section.applicability
+        if applicability and not applicability.active:
+            inapplicable.append(section.id)
+        else:
+            applicable.append(section.id)
+        if applicability and applicability.modified:
+            modified.append(section.id)
+    return AMApplicability(am_id, tuple(applicable), tuple(inapplicable), tuple(modified))
+
+
+def _group_by_am_id(
+    installations: Dict[str, List[DetailedClassement]], am_index: AMIndex
+) -> Dict[str, Dict[str, List[DetailedClassement]]]:
+    groups: Dict[str, Dict[str, List[DetailedClassement]]] = {}
+    for s3ic_id, classements in installations.items():
+        for am_id, am_classements in am_index.group_by_am_id(classements).items():
+            groups.setdefault(am_id, {})[s3ic_id] = am_classements
+    return groups
+
+
+def _evaluate_am(
+    am_id: str, inputs: AMInputs, installations: Dict[str, List[DetailedClassement]], result: BatchResult
+) -> None:
+    compiled = compile_parametrization(inputs.parametrization)
+    groups: Dict[Union[EquivalenceKey, str], List[Tuple[str, Dict[Parameter, Any]]]] = {}
+    for s3ic_id, classements in installations.items():
+        try:
+            parameter_values = known_parameter_dict(classements)  # NC and unknown regimes have no date
+        except ValueError as exc:
+            result.errors.setdefault(s3ic_id, {})[am_id] = str(exc)
+            continue
+        try:
+            key: Union[EquivalenceKey, str] = compiled.equivalence_key(parameter_values)
+        except TypeError:  # Values not comparable to the thresholds of the AM are applied on their own
+            key = s3ic_id
+        groups.setdefault(key, []).append((s3ic_id, parameter_values))
+    for group in groups.values():
+        parameter_values = group[0][1]  # All parameter values of the group lead to the same applied AM
+        try:
+            applied_am = apply_parameter_values_to_am(inputs.am, parameter_values, inputs.parametrization)
+        except ValueError as exc:
+            for s3ic_id, _ in group:
+                result.errors.setdefault(s3ic_id, {})[am_id] = str(exc)
+            continue
+        applicability = _am_applicability(am_id, applied_am)  # Shared by all installations of the group
+        for s3ic_id, _ in group:
+            result.applicability.setdefault(s3ic_id, {})[am_id] = applicability
+
+
+def _group_by_installation(classements: Iterable[DetailedClassement]) -> Dict[str, List[DetailedClassement]]:
+    installations: Dict[str, List[DetailedClassement]] = {}
+    for classement in classements:
+        installations.setdefault(classement.s3ic_id, []).append(classement)
+    return installations
+
+
+def evaluate_installations(
+    classements: Iterable[DetailedClassement], am_index: AMIndex, am_inputs: Optional[Dict[str, AMInputs]] = None
+) -> BatchResult:
+    """Compute the applicable sections of the applicable AMs of all installations of the given classements.
+
+    Args:
+        classements (Iterable[DetailedClassement]): classements of the installations to evaluate.
+        am_index (AMIndex): index of the AMs to match.
+        am_inputs (Optional[Dict[str, AMInputs]], optional): AMs with their parametrization. Defaults to None,
+            loading the applicable AMs in a few queries.
+
+    Returns:
+        BatchResult: applicability of each applicable AM for each installation, and errors of the
+            (installation, AM) pairs for which parameter values could not be computed or applied.
+    """
+    installations_by_am_id = _group_by_am_id(_group_by_installation(classements), am_index)
+    if am_inputs is None:
+        am_inputs = load_am_inputs(set(installations_by_am_id))
+    result = BatchResult({}, {})
+    for am_id, installations in typed_tqdm(sorted(installations_by_am_id.items()), 'Evaluating AMs', leave=False):
+        _evaluate_am(am_id, am_inputs[am_id], installations, result)
+    return result
@@ -0,0 +1,233 @@
+'''
+Parametrization of an AM compiled to a flat list of section conditions.
+
+Each inapplicable or alternative section of a parametrization becomes a CompiledElement with
+its section id and its condition predicate. Evaluating the predicates of all elements gives the
+predicate vector of a set of parameter values. Two sets of parameter values with the same
+vector and the same unknown parameters lead to the same AM once parameters are applied: their
+equivalence key is the same. The thresholds compared to each parameter are extracted as well,
+to enumerate representative parameter values.
+'''
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from itertools import combinations, product
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from envinorma.models import Parameter
+from envinorma.parametrization import (
+    AlternativeSection,
+    AndCondition,
+    Condition,
+    Equal,
+    Greater,
+    InapplicableSection,
+    LeafCondition,
+    Littler,
+    OrCondition,
+    Parametrization,
+    Range,
+)
+
+PredicateVector = Tuple[Optional[bool], ...]  # None when a parameter of the condition is unknown
+EquivalenceKey = Tuple[PredicateVector, Tuple[str, ...]]  # With the ids of the unknown parameters
+
+
+class _Other:
+    """Value of an unordered parameter equal to none of its targets."""
+
+    def __repr__(self) -> str:
+        return 'other'
+
+
+def _leaf_conditions(condition: Condition) -> Iterable[LeafCondition]:
+    if isinstance(condition, (AndCondition, OrCondition)):
+        for sub_condition in condition.conditions:
+            yield from _leaf_conditions(sub_condition)
+    else:
+        yield condition
+
+
+def _and(values: List[Optional[bool]]) -> Optional[bool]:
+    if any(value is False for value in values):
+        return False
+    return None if None in values else True
+
+
+def _or(values: List[Optional[bool]]) -> Optional[bool]:
+    if any(value is True for value in values):
+        return True
+    return None if None in values else False
+
+
+def _compare(value: Any, target: Any, strict: bool, greater: bool) -> bool:
+    if value == target:
+        return not strict
+    return value > target if greater else value < target
+
+
+def _evaluate_leaf(condition: LeafCondition, value: Any) -> bool:
+    if isinstance(condition, Equal):
+        return value == condition.target
+    if isinstance(condition, (Greater, Littler)):
+        return _compare(value, condition.target, condition.strict, isinstance(condition, Greater))
+    if isinstance(condition, Range):
+        return _compare(value, condition.left, condition.left_strict, True) and _compare(
+            value, condition.right, condition.right_strict, False
+        )
+    raise ValueError(f'Unhandled condition type {type(condition).__name__}')
+
+
+def evaluate_condition(condition: Condition, parameter_values: Dict[Parameter, Any]) -> Optional[bool]:
+    """Evaluate a condition, returning None when it depends on a parameter without value.
+
+    Raises:
+        TypeError: if a value cannot be compared to the target of its condition.
+    """
+    if isinstance(condition, (AndCondition, OrCondition)):
+        values = [evaluate_condition(sub_condition, parameter_values) for sub_condition in condition.conditions]
+        return _or(values) if isinstance(condition, OrCondition) else _and(values)
+    if condition.parameter not in parameter_values:
+        return None
+    return _evaluate_leaf(condition, parameter_values[condition.parameter])
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _ordered_representative_values(thresholds: List[Any]) -> List[Any]:
+    if not thresholds:
+        return []
+    values: List[Any] = [_shift(thresholds[0], -1)]
+    for left, right in zip(thresholds, thresholds[1:]):
+        values.extend([left, *_values_between(left, right)])
+    return [*values, thresholds[-1], _shift(thresholds[-1], 1)]
+
+
+@dataclass
+class ParameterThresholds:
+    equal: List[Any] = field(default_factory=list)
+    numbers: List[Any] = field(default_factory=list)  # Sorted numeric thresholds
+    dates: List[Any] = field(default_factory=list)  # Sorted date thresholds
+
+    def representative_values(self) -> List[Any]:
+        """One value in each class of values that conditions on these thresholds cannot distinguish."""
+        values = [*_ordered_representative_values(self.numbers), *_ordered_representative_values(self.dates)]
+        unordered = [value for value in self.equal if not _is_number(value) and not isinstance(value, date)]
+        if unordered or not values:
+            values.extend([*unordered, _Other()])
+        return values
+
+
+def _shift(value: Any, direction: int) -> Any:
+    return value + (timedelta(days=direction) if isinstance(value, date) else direction)
+
+
+def _values_between(left: Any, right: Any) -> List[Any]:
+    if isinstance(left, date):
+        return [left + (right - left) / 2] if (right - left).days > 1 else []
+    return [(left + right) / 2]
+
+
+@dataclass
+class CompiledElement:
+    section_id: str
+    is_alternative: bool  # Alternative section if True, inapplicable section otherwise
+    condition: Condition
+    parameters: List[Parameter]
+
+    def evaluate(self, parameter_values: Dict[Parameter, Any]) -> Optional[bool]:
+        return evaluate_condition(self.condition, parameter_values)
+
+
+@dataclass
+class CompiledParametrization:
+    elements: List[CompiledElement]
+    thresholds: Dict[Parameter, ParameterThresholds]
+
+    def predicate_vector(self, parameter_values: Dict[Parameter, Any]) -> PredicateVector:
+        return tuple(element.evaluate(parameter_values) for element in self.elements)
+
+    def equivalence_key(self, parameter_values: Dict[Parameter, Any]) -> EquivalenceKey:
+        """Key shared by all parameter values leading to the same applied AM.
+
+        Unknown parameters are part of the key: conditions depending on different unknown
+        parameters both evaluate to None, but applying them gives different warnings.
+
+        Raises:
+            TypeError: if a value cannot be compared to the target of a condition. Such values
+                have no key and must be applied without cache.
+        """
+        unknown_parameters = (parameter for parameter in self.thresholds if parameter not in parameter_values)
+        return self.predicate_vector(parameter_values), tuple(sorted(parameter.id for parameter in unknown_parameters))
+
+    def elements_by_section(self) -> Dict[str, List[CompiledElement]]:
+        result: Dict[str, List[CompiledElement]] = {}
+        for element in self.elements:
+            result.setdefault(element.section_id, []).append(element)
+        return result
+
+    def conflicting_elements(self) -> List[Tuple[CompiledElement, CompiledElement]]:
+        """Pairs of alternative sections of the same section that can both apply to some parameter values."""
+        conflicts = []
+        for elements in self.elements_by_section().values():
+            alternatives = [element for element in elements if element.is_alternative]
+            for first, second in combinations(alternatives, 2):
+                if self._can_both_apply(first, second):
+                    conflicts.append((first, second))
+        return conflicts
+
+    def _can_both_apply(self, first: CompiledElement, second: CompiledElement) -> bool:
+        parameters = sorted(set(first.parameters) | set(second.parameters), key=lambda parameter: parameter.id)
+        candidate_values = [self.thresholds[parameter].representative_values() for parameter in parameters]
+        for values in product(*candidate_values):
+            parameter_values = dict(zip(parameters, values))
+            try:
+                if first.evaluate(parameter_values) and second.evaluate(parameter_values):
+                    return True
+            except TypeError:  # Value of a type compared to thresholds of another type
+                continue
+        return False
+
+
+def _targets(condition: LeafCondition) -> List[Any]:
+    if isinstance(condition, Range):
+        return [condition.left, condition.right]
+    return [condition.target]
+
+
+def _thresholds(conditions: List[LeafCondition]) -> Dict[Parameter, ParameterThresholds]:
+    targets: Dict[Parameter, List[Any]] = {}
+    for condition in conditions:
+        targets.setdefault(condition.parameter, []).extend(_targets(condition))
+    return {
+        parameter: ParameterThresholds(
+            list(set(values)),
+            sorted({value for value in values if _is_number(value)}),
+            sorted({value for value in values if isinstance(value, date)}),
+        )
+        for parameter, values in targets.items()
+    }
+
+
+def _compile_element(element: Union[InapplicableSection, AlternativeSection], is_alternative: bool) -> CompiledElement:
+    parameters = sorted({leaf.parameter for leaf in _leaf_conditions(element.condition)}, key=lambda param: param.id)
+    return CompiledElement(element.section_id, is_alternative, element.condition, parameters)
+
+
+def compile_parametrization(parametrization: Parametrization) -> CompiledParametrization:
+    """Flatten the inapplicable and alternative sections of a parametrization with their conditions.
+
+    Args:
+        parametrization (Parametrization): parametrization of an AM.
+
+    Returns:
+        CompiledParametrization: one element per inapplicable or alternative section, in parametrization order,
+            with the thresholds compared to each parameter.
+    """
+    elements = [
+        *[_compile_element(element, False) for element in parametrization.application_conditions],
+        *[_compile_element(element, True) for element in parametrization.alternative_sections],
+    ]
+    conditions = [leaf for element in elements for leaf in _leaf_conditions(element.condition)]
+    return CompiledParametrization(elements, _thresholds(conditions))
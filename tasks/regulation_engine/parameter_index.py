@@ -0,0 +1,64 @@
+'''
+Inverted index of the parameters used by AM parametrizations: parameter id -> AM id -> section ids.
+
+It is built from compiled parametrizations once per data build, and answers questions such as
+"which AMs depend on the alinea" without loading any parametrization.
+'''
+import json
+import os
+from typing import Dict, List, Set
+
+from envinorma.parametrization import Parametrization
+
+from tasks.regulation_engine.compiled_parametrization import compile_parametrization
+
+
+class ParameterIndex:
+    def __init__(self, index: Dict[str, Dict[str, List[str]]]) -> None:
+        self._index = index
+
+    def parameter_ids(self) -> Set[str]:
+        return set(self._index)
+
+    def am_ids(self, parameter_id: str) -> Set[str]:
+        """Ids of the AMs with at least one section depending on the parameter."""
+        return set(self._index.get(parameter_id, {}))
+
+    def section_ids(self, parameter_id: str, am_id: str) -> List[str]:
+        """Ids of the sections of an AM that are inapplicable or modified depending on the parameter."""
+        return self._index.get(parameter_id, {}).get(am_id, [])
+
+    def to_dict(self) -> Dict[str, Dict[str, List[str]]]:
+        return self._index
+
+    def dump(self, filename: str) -> None:
+        with open(filename + '.tmp', 'w') as file_:
+            json.dump(self._index, file_, indent=2, sort_keys=True)
+        os.replace(filename + '.tmp', filename)
+
+    @classmethod
+    def load(cls, filename: str) -> 'ParameterIndex':
+        with open(filename) as file_:
+            return cls(json.load(file_))
+
+
+def build_parameter_index(parametrizations: Dict[str, Parametrization]) -> ParameterIndex:
+    """Index the sections of each AM by the parameters their conditions depend on.
+
+    Args:
+        parametrizations (Dict[str, Parametrization]): parametrizations by AM id.
+
+    Returns:
+        ParameterIndex: index of the parameters used by the parametrizations.
+    """
+    index: Dict[str, Dict[str, Set[str]]] = {}
+    for am_id, parametrization in parametrizations.items():
+        for element in compile_parametrization(parametrization).elements:
+            for parameter in element.parameters:
+                index.setdefault(parameter.id, {}).setdefault(am_id, set()).add(element.section_id)
+    return ParameterIndex(
+        {
+            parameter_id: {am_id: sorted(section_ids) for am_id, section_ids in sorted(am_sections.items())}
+            for parameter_id, am_sections in sorted(index.items())
+        }
+    )
@@ -0,0 +1,41 @@
+'''
+Parameter values of an installation for an applicable AM, deduced from its classements.
+'''
+from typing import Any, Dict, List
+
+from envinorma.models import DetailedClassement, DetailedRegime, Parameter, ParameterEnum
+
+_DATE_PARAMETERS: Dict[DetailedRegime, Parameter] = {
+    DetailedRegime.A: ParameterEnum.DATE_AUTORISATION.value,
+    DetailedRegime.D: ParameterEnum.DATE_DECLARATION.value,
+    DetailedRegime.E: ParameterEnum.DATE_ENREGISTREMENT.value,
+}
+
+
+def _remove_none_values(parameter_values: Dict[Parameter, Any]) -> Dict[Parameter, Any]:
+    return {parameter: value for parameter, value in parameter_values.items() if value is not None}
+
+
+def known_parameter_dict(classements: List[DetailedClassement]) -> Dict[Parameter, Any]:
+    """Same as parameter_dict, but the date parameter is left unknown for regimes without one instead of raising."""
+    if len(classements) == 0:
+        raise ValueError('At least one classement is needed')
+    if len(classements) > 1:
+        return {}  # Parameter values are considered unknown to avoid ambiguity.
+    classement = classements[0]
+    parameter_values = {
+        ParameterEnum.REGIME.value: classement.regime.to_regime(),
+        ParameterEnum.ALINEA.value: classement.alinea,
+        ParameterEnum.RUBRIQUE.value: classement.rubrique,
+        ParameterEnum.DATE_INSTALLATION.value: classement.date_mise_en_service,
+    }
+    date = _DATE_PARAMETERS.get(classement.regime)
+    if date is not None:
+        parameter_values[date] = classement.date_autorisation
+    return _remove_none_values(parameter_values)
+
+
+def parameter_dict(classements: List[DetailedClassement]) -> Dict[Parameter, Any]:
+    if len(classements) == 1 and classements[0].regime not in _DATE_PARAMETERS:
+        raise ValueError(f'Unepected regime: {classements[0].regime}')
+    return known_parameter_dict(classements)
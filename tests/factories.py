@@ -0,0 +1,82 @@
+"""Builders of envinorma models shared by tests, with defaults for the fields tests do not look at."""
+from datetime import date
+from typing import List, Optional, Tuple
+
+from envinorma.models import (
+    AMMetadata,
+    AMSource,
+    AMState,
+    ArreteMinisteriel,
+    Classement,
+    DetailedClassement,
+    DetailedRegime,
+    EnrichedString,
+    Regime,
+    StructuredText,
+)
+from envinorma.parametrization import AlternativeSection, Condition, InapplicableSection, Parametrization
+
+S3IC_ID = '0065.12345'
+
+
+def detailed_classement(
+    rubrique: str,
+    regime: DetailedRegime,
+    alinea: Optional[str] = None,
+    s3ic_id: str = S3IC_ID,
+    date_autorisation: Optional[date] = None,
+) -> DetailedClassement:
+    return DetailedClassement(
+        s3ic_id=s3ic_id,
+        rubrique=rubrique,
+        regime=regime,
+        alinea=alinea,
+        date_autorisation=date_autorisation,
+        state=None,
+        regime_acte=None,
+        alinea_acte=None,
+        rubrique_acte=rubrique,
+        activite=None,
+        volume='',
+        unit='',
+    )
+
+
+def am_metadata(am_id: str, classements: List[Tuple[str, Regime, Optional[str]]]) -> AMMetadata:
+    """AM metadata with the given (rubrique, regime, alinea) classements."""
+    return AMMetadata(
+        cid=am_id,
+        aida_page='',
+        page_name='',
+        short_title=f'Arrêté {am_id}',
+        classements=[Classement(rubrique, regime, alinea) for rubrique, regime, alinea in classements],
+        state=AMState.VIGUEUR,
+        publication_date=0,
+        source=AMSource.LEGIFRANCE,
+    )
+
+
+def arrete_ministeriel(am_id: str) -> ArreteMinisteriel:
+    """AM without sections."""
+    return ArreteMinisteriel(title=EnrichedString(f'Arrêté {am_id}'), sections=[], visa=[], id=am_id)
+
+
+def parametrization(
+    inapplicable_sections: List[Tuple[str, Condition]], alternative_sections: List[Tuple[str, Condition]]
+) -> Parametrization:
+    """Parametrization with the given (section id, condition) inapplicable and alternative sections."""
+    return Parametrization(
+        application_conditions=[
+            InapplicableSection(section_id=section_id, alineas=None, condition=condition)
+            for section_id, condition in inapplicable_sections
+        ],
+        alternative_sections=[
+            AlternativeSection(
+                section_id=section_id,
+                new_text=StructuredText(EnrichedString('Section modifiée'), [], [], None),
+                condition=condition,
+            )
+            for section_id, condition in alternative_sections
+        ],
+        warnings=[],
+    )
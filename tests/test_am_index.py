@@ -0,0 +1,25 @@
+from envinorma.models import DetailedRegime, Regime
+
+from tasks.regulation_engine.am_index import AMIndex
+from tests.factories import am_metadata, detailed_classement
+
+
+def test_am_index():
+    metadata = {
+        'any_alinea': am_metadata('any_alinea', [('2521', Regime.E, None)]),
+        'alinea_a': am_metadata('alinea_a', [('2521', Regime.E, 'A'), ('1510', Regime.A, None)]),
+        'other_regime': am_metadata('other_regime', [('2521', Regime.A, None)]),
+    }
+    index = AMIndex(metadata)
+
+    assert index.applicable_am_ids(detailed_classement('2521', DetailedRegime.E, 'A')) == {'any_alinea', 'alinea_a'}
+    assert index.applicable_am_ids(detailed_classement('2521', DetailedRegime.E, 'B')) == {'any_alinea'}
+    assert index.applicable_am_ids(detailed_classement('2521', DetailedRegime.E)) == {'any_alinea'}
+    assert index.applicable_am_ids(detailed_classement('2521', DetailedRegime.A)) == {'other_regime'}
+    assert index.applicable_am_ids(detailed_classement('2521', DetailedRegime.D)) == set()
+    assert index.applicable_am_ids(detailed_classement('1234', DetailedRegime.E)) == set()
+
+    classement_2521 = detailed_classement('2521', DetailedRegime.E, 'A')
+    classements = [classement_2521, detailed_classement('1510', DetailedRegime.A, '1')]
+    groups = index.group_by_am_id(classements)
+    assert groups == {'any_alinea': classements[:1], 'alinea_a': classements}
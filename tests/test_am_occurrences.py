@@ -0,0 +1,25 @@
+import pandas
+from envinorma.models import Regime
+
+from tasks.data_build.build.build_am_occurrences import compute_am_occurrences
+from tests.factories import am_metadata
+
+
+def test_compute_am_occurrences():
+    metadata = {
+        'am-1': am_metadata('am-1', [('2510', Regime.A, None), ('2510', Regime.A, '1')]),
+        'am-2': am_metadata('am-2', [('2510', Regime.A, '2'), ('1510', Regime.D, '')]),
+        'am-3': am_metadata('am-3', [('9999', Regime.E, None)]),
+    }
+    classements = pandas.DataFrame(
+        [['i1', '2510', 'A', '1'], ['i1', '2510', 'A', '2'], ['i2', '2510', 'A', None], ['i3', '1510', 'D', '3']],
+        columns=['s3ic_id', 'rubrique', 'regime', 'alinea'],
+    )
+    installations = pandas.DataFrame([['i1', 'IDF'], ['i2', 'BRE']], columns=['s3ic_id', 'region'])
+    occurrences = compute_am_occurrences(classements, installations, metadata)
+    assert occurrences.to_dict(orient='records') == [
+        {'am_id': 'am-1', 'region': 'BRE', 'nb_classements': 1},
+        {'am_id': 'am-1', 'region': 'IDF', 'nb_classements': 2},
+        {'am_id': 'am-2', 'region': '', 'nb_classements': 1},
+        {'am_id': 'am-2', 'region': 'IDF', 'nb_classements': 1},
+    ]
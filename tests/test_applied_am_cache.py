@@ -0,0 +1,60 @@
+from datetime import date
+from typing import Any, Dict, List
+
+import pytest
+from envinorma.models import ArreteMinisteriel, Parameter, ParameterEnum
+from envinorma.parametrization import Littler
+
+from tasks.regulation_engine import applied_am_cache
+from tasks.regulation_engine.applied_am_cache import AppliedAMCache
+from tests.factories import arrete_ministeriel, parametrization
+
+_DATE = ParameterEnum.DATE_AUTORISATION.value
+_AM = arrete_ministeriel('am')
+_PARAMETRIZATION = parametrization([('a', Littler(_DATE, date(2010, 1, 1), strict=True))], [])
+
+
+@pytest.fixture
+def applied(monkeypatch) -> List[Dict[Parameter, Any]]:
+    calls: List[Dict[Parameter, Any]] = []
+
+    def _apply(
+        am: ArreteMinisteriel, parameter_values: Dict[Parameter, Any], parametrization: Any
+    ) -> ArreteMinisteriel:
+        calls.append(parameter_values)
+        return arrete_ministeriel(am.id or '')
+
+    monkeypatch.setattr(applied_am_cache, 'apply_parameter_values_to_am', _apply)
+    return calls
+
+
+def test_equivalent_parameter_values_share_applied_am(applied: List[Dict[Parameter, Any]]):
+    cache = AppliedAMCache()
+    first = cache.apply('am', _AM, _PARAMETRIZATION, {_DATE: date(2000, 1, 1)})
+    assert cache.apply('am', _AM, _PARAMETRIZATION, {_DATE: date(2005, 1, 1)}) is first
+    assert cache.apply('am', _AM, _PARAMETRIZATION, {_DATE: date(2015, 1, 1)}) is not first
+    assert cache.apply('am', _AM, _PARAMETRIZATION, {}) is not first
+    assert cache.apply('other', _AM, _PARAMETRIZATION, {_DATE: date(2000, 1, 1)}) is not first
+    assert len(applied) == 4
+    assert (cache.nb_hits, cache.nb_misses) == (1, 4)
+    assert cache.hit_rate == 0.2
+
+
+def test_least_recently_used_entry_is_evicted(applied: List[Dict[Parameter, Any]]):
+    cache = AppliedAMCache(max_size=2)
+    old: Dict[Parameter, Any] = {_DATE: date(2000, 1, 1)}
+    recent: Dict[Parameter, Any] = {_DATE: date(2015, 1, 1)}
+    new: Dict[Parameter, Any] = {}
+    for parameter_values in (old, recent, old, new, old, recent):  # recent is evicted by new
+        cache.apply('am', _AM, _PARAMETRIZATION, parameter_values)
+    assert applied == [old, recent, new, recent]
+    assert (cache.nb_hits, cache.nb_misses) == (2, 4)
+    assert AppliedAMCache().hit_rate == 0.0
+
+
+def test_values_without_equivalence_class_are_not_cached(applied: List[Dict[Parameter, Any]]):
+    cache = AppliedAMCache()
+    for _ in range(2):
+        cache.apply('am', _AM, _PARAMETRIZATION, {_DATE: 'unknown'})
+    assert len(applied) == 2
+    assert (cache.nb_hits, cache.nb_misses) == (0, 2)
@@ -0,0 +1,29 @@
+from typing import Any, Dict, List
+
+from envinorma.models import ArreteMinisteriel, DetailedRegime, Parameter, ParameterEnum, Regime
+
+from tasks.data_build.load import AMInputs
+from tasks.regulation_engine import batch
+from tasks.regulation_engine.am_index import AMIndex
+from tasks.regulation_engine.batch import AMApplicability, evaluate_installations
+from tests.factories import S3IC_ID, am_metadata, arrete_ministeriel, detailed_classement, parametrization
+
+
+def test_evaluate_installations_with_nc_classement_only(monkeypatch):
+    applied: List[Dict[Parameter, Any]] = []
+
+    def _apply(
+        am: ArreteMinisteriel, parameter_values: Dict[Parameter, Any], parametrization: Any
+    ) -> ArreteMinisteriel:
+        applied.append(parameter_values)
+        return am
+
+    monkeypatch.setattr(batch, 'apply_parameter_values_to_am', _apply)
+    metadata = am_metadata('am-1', [('2521', Regime.NC, None)])
+    inputs = AMInputs(arrete_ministeriel('am-1'), parametrization([], []), metadata)
+    result = evaluate_installations(
+        [detailed_classement('2521', DetailedRegime.NC)], AMIndex({'am-1': metadata}), {'am-1': inputs}
+    )
+    assert result.errors == {}
+    assert result.applicability == {S3IC_ID: {'am-1': AMApplicability('am-1', (), (), ())}}
+    assert applied == [{ParameterEnum.REGIME.value: Regime.NC, ParameterEnum.RUBRIQUE.value: '2521'}]
@@ -6,54 +6,34 @@ import pytest
 from envinorma.models import DetailedClassement, DetailedClassementState, DetailedRegime
 
 from tasks.data_build.build.from_s3ic.classements import _check_classements
-from tasks.data_build.validate.check_classements import _check_classement_is_safe, _is_4xxx, _is_47xx
+from tasks.data_build.validate.check_classements import CLASSEMENTS_SCHEMA, _47xx_rows_are_not_void
+from tasks.data_build.validate.schema import as_csv_strings, validate_dataframe
 
 
-def test_is_47xx():
-    assert _is_47xx('47')
-    assert _is_47xx('472')
-    assert _is_47xx('4722')
-    assert _is_47xx('47222')
-    assert not _is_47xx(None)
-    assert not _is_47xx('4')
-    assert not _is_47xx('14')
-    assert not _is_47xx('142')
-    assert not _is_47xx('1422')
-    assert not _is_47xx('14222')
+def _classements_dataframe(*classements: DetailedClassement) -> pandas.DataFrame:
+    return as_csv_strings(pandas.DataFrame.from_records([json.loads(classement.json()) for classement in classements]))
 
 
-def test_is_4xxx():
-    assert _is_4xxx('4642')
-    assert _is_4xxx('47xx')
-    assert _is_4xxx('4801')
-    assert not _is_4xxx('4')
-    assert not _is_4xxx('42')
-    assert not _is_4xxx('422')
-    assert not _is_4xxx('14')
-    assert not _is_4xxx('142')
-    assert not _is_4xxx('1422')
-    assert not _is_4xxx('14222')
-
-
-def test_check_classement_is_safe():
-    _check_classement_is_safe(
-        DetailedClassement(
-            s3ic_id='0065.12345',
-            rubrique='47xx',
-            regime=DetailedRegime.NC,
-            alinea=None,
-            date_autorisation=None,
-            state=None,
-            regime_acte=DetailedRegime.NC,
-            alinea_acte=None,
-            rubrique_acte='47xx',
-            activite=None,
-            volume='',
-            unit='',
-        )
+def _void_47xx_classement() -> DetailedClassement:
+    return DetailedClassement(
+        s3ic_id='0065.12345',
+        rubrique='47xx',
+        regime=DetailedRegime.NC,
+        alinea=None,
+        date_autorisation=None,
+        state=None,
+        regime_acte=DetailedRegime.NC,
+        alinea_acte=None,
+        rubrique_acte='47xx',
+        activite=None,
+        volume='',
+        unit='',
     )
 
-    _check_classement_is_safe(
+
+def test_47xx_rows_are_not_void():
+    classements = _classements_dataframe(
+        _void_47xx_classement(),
         DetailedClassement(
             s3ic_id='0065.12345',
             rubrique='4801',
@@ -67,10 +47,7 @@ def test_check_classement_is_safe():
             activite=None,
             volume='',
             unit='',
-        )
-    )
-
-    _check_classement_is_safe(
+        ),
         DetailedClassement(
             s3ic_id='0065.12345',
             rubrique='4029',
@@ -84,26 +61,48 @@ def test_check_classement_is_safe():
             activite='',
             volume='',
             unit='',
-        )
+        ),
+        DetailedClassement(
+            s3ic_id='0065.12345',
+            rubrique='47xx',
+            regime=DetailedRegime.A,
+            alinea='1.',
+            date_autorisation=date.today(),
+            state=DetailedClassementState.EN_FONCTIONNEMENT,
+            regime_acte=DetailedRegime.A,
+            alinea_acte='',
+            rubrique_acte='3019',
+            activite='',
+            volume='1.2',
+            unit='t',
+        ),
+        DetailedClassement(
+            s3ic_id='0065.12345',
+            rubrique='1510',
+            regime=DetailedRegime.E,
+            alinea=None,
+            date_autorisation=None,
+            state=None,
+            regime_acte=DetailedRegime.E,
+            alinea_acte=None,
+            rubrique_acte='4722',
+            activite=None,
+            volume='',
+            unit='',
+        ),
     )
+    assert _47xx_rows_are_not_void(classements).tolist() == [False, False, False, True, True]
 
-    with pytest.raises(AssertionError):
-        _check_classement_is_safe(
-            DetailedClassement(
-                s3ic_id='0065.12345',
-                rubrique='47xx',
-                regime=DetailedRegime.A,
-                alinea='1.',
-                date_autorisation=date.today(),
-                state=DetailedClassementState.EN_FONCTIONNEMENT,
-                regime_acte=DetailedRegime.A,
-                alinea_acte='',
-                rubrique_acte='3019',
-                activite='',
-                volume='1.2',
-                unit='t',
-            )
-        )
+
+def test_classements_schema():
+    classements = _classements_dataframe(_void_47xx_classement())
+    assert validate_dataframe(classements, CLASSEMENTS_SCHEMA, {'installations': {'0065.12345'}}).is_valid
+
+    classements.loc[0, 'volume'] = '1.2'
+    report = validate_dataframe(classements, CLASSEMENTS_SCHEMA, {'installations': {'0065.12345'}})
+    assert [violation.rule for violation in report.violations] == ['47xx classements are not void']
+    with pytest.raises(ValueError):
+        report.raise_if_invalid()
 
 
 def test_build_dataframe():
@@ -0,0 +1,56 @@
+from datetime import date
+
+import pytest
+from envinorma.models import ParameterEnum, Regime
+from envinorma.parametrization import AndCondition, Condition, Equal, Littler, OrCondition, Parametrization, Range
+
+from tasks.regulation_engine.compiled_parametrization import compile_parametrization
+from tests.factories import parametrization
+
+_DATE = ParameterEnum.DATE_AUTORISATION.value
+_REGIME = ParameterEnum.REGIME.value
+_RUBRIQUE = ParameterEnum.RUBRIQUE.value
+_BEFORE_2010 = Littler(_DATE, date(2010, 1, 1), strict=True)
+
+
+def _parametrization(alternative_condition: Condition) -> Parametrization:
+    return parametrization([('a', _BEFORE_2010)], [('b', alternative_condition), ('b', Equal(_REGIME, Regime.E))])
+
+
+def test_predicate_vector():
+    between = Range(_DATE, date(2010, 1, 1), date(2015, 1, 1), left_strict=False, right_strict=True)
+    compiled = compile_parametrization(_parametrization(AndCondition([between, Equal(_REGIME, Regime.A)])))
+    assert compiled.thresholds[_DATE].dates == [date(2010, 1, 1), date(2015, 1, 1)]
+    assert compiled.predicate_vector({_DATE: date(2000, 1, 1), _REGIME: Regime.A}) == (True, False, False)
+    assert compiled.predicate_vector({_DATE: date(2010, 1, 1), _REGIME: Regime.A}) == (False, True, False)
+    assert compiled.predicate_vector({_DATE: date(2015, 1, 1), _REGIME: Regime.E}) == (False, False, True)
+    assert compiled.predicate_vector({_REGIME: Regime.D}) == (None, False, False)
+    assert compiled.predicate_vector({_REGIME: Regime.A}) == (None, None, False)
+    assert compiled.conflicting_elements() == []
+
+
+def test_equivalence_key():
+    condition = OrCondition([_BEFORE_2010, Equal(_REGIME, Regime.A)])
+    compiled = compile_parametrization(parametrization([('a', condition)], []))
+    regime_a = compiled.equivalence_key({_REGIME: Regime.A})
+    old_date = compiled.equivalence_key({_DATE: date(2000, 1, 1)})
+    assert regime_a == ((True,), (_DATE.id,))
+    assert old_date == ((True,), (_REGIME.id,))  # Same predicate vector, other unknown parameter
+    assert regime_a == compiled.equivalence_key({_REGIME: Regime.A, _RUBRIQUE: '1510'})
+
+
+def test_conflicting_elements():
+    compiled = compile_parametrization(_parametrization(Littler(_DATE, date(2015, 1, 1), strict=False)))
+    assert [(first.section_id, second.section_id) for first, second in compiled.conflicting_elements()] == [('b', 'b')]
+
+
+def test_numeric_and_date_thresholds():
+    between = Range(_DATE, 0, 10, left_strict=False, right_strict=True)
+    compiled = compile_parametrization(
+        parametrization([('a', _BEFORE_2010)], [('b', between), ('b', Littler(_DATE, 5, strict=True))])
+    )
+    assert compiled.thresholds[_DATE].numbers == [0, 5, 10]
+    assert compiled.thresholds[_DATE].dates == [date(2010, 1, 1)]
+    assert [(first.section_id, second.section_id) for first, second in compiled.conflicting_elements()] == [('b', 'b')]
+    with pytest.raises(TypeError):
+        compiled.equivalence_key({_DATE: 3})
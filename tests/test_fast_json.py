@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from tasks.common.fast_json import JSON_BACKENDS
+
+_OBJECTS = [
+    {'id': 'JORFTEXT000000000001', 'sections': [{'title': 'Article 1', 'outer_alineas': []}], 'version': 1.0},
+    {'b': ['é€😀', 'line\nbreak', 'tab\t', '"quote" \\ /', '\x01\x7f'], 'a': {'c': None, 'd': True}},
+    {'small': 1e-05, 'big': 1e20, 'huge': 10 ** 30, 'negative': -0.5},
+    [[], {}, [{}], 0],
+]
+
+
+@pytest.mark.parametrize('backend', list(JSON_BACKENDS))
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+@pytest.mark.parametrize('sort_keys', [True, False])
+def test_backends_match_json(backend: str, ensure_ascii: bool, sort_keys: bool):
+    for object_ in _OBJECTS:
+        expected = json.dumps(object_, ensure_ascii=ensure_ascii, indent=2, sort_keys=sort_keys)
+        assert JSON_BACKENDS[backend].dumps(object_, ensure_ascii, sort_keys) == expected
+        assert JSON_BACKENDS[backend].loads(expected) == object_
+        assert JSON_BACKENDS[backend].loads(expected.encode()) == object_
+
+
+@pytest.mark.parametrize('backend', list(JSON_BACKENDS))
+def test_backends_keep_non_finite_floats(backend: str):
+    object_ = {'values': [float('nan'), float('inf'), -float('inf'), None], 'nested': {'value': float('nan')}}
+    assert JSON_BACKENDS[backend].dumps(object_, True, False) == json.dumps(object_, indent=2)
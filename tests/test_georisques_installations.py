@@ -0,0 +1,12 @@
+import pandas
+
+from tasks.data_build.build.from_georisques.installations import _add_region_and_department
+
+
+def test_add_region_and_department():
+    s3ic_ids = ['0001.00001', '0002.00002', '0003.00003']
+    installations = pandas.DataFrame({'s3ic_id': s3ic_ids, 'num_dep': ['08', '2A', '']})
+    result = _add_region_and_department(installations)
+    assert result.s3ic_id.tolist() == s3ic_ids
+    assert result.region.tolist() == ['GRAND EST', 'CORSE', '']
+    assert result.department.tolist()[2] == ''
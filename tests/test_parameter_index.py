@@ -0,0 +1,22 @@
+from envinorma.models import ParameterEnum, Regime
+from envinorma.parametrization import AndCondition, Equal
+
+from tasks.regulation_engine.parameter_index import build_parameter_index
+from tests.factories import parametrization
+
+_REGIME = ParameterEnum.REGIME.value
+_ALINEA = ParameterEnum.ALINEA.value
+
+
+def test_build_parameter_index():
+    regime = Equal(_REGIME, Regime.A)
+    alinea = Equal(_ALINEA, '1')
+    parametrizations = {
+        'am-1': parametrization([('b', regime), ('a', AndCondition([regime, alinea]))], []),
+        'am-2': parametrization([], [('c', alinea)]),
+    }
+    index = build_parameter_index(parametrizations)
+    assert index.parameter_ids() == {_REGIME.id, _ALINEA.id}
+    assert index.am_ids(_ALINEA.id) == {'am-1', 'am-2'}
+    assert index.section_ids(_REGIME.id, 'am-1') == ['a', 'b']
+    assert index.am_ids(ParameterEnum.RUBRIQUE.value.id) == set()
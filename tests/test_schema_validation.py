@@ -0,0 +1,58 @@
+import pandas
+import pytest
+
+from tasks.data_build.validate.schema import S3IC_ID_REGEXP, Column, RowRule, Schema, validate_dataframe
+
+_SCHEMA = Schema(
+    'test',
+    [
+        Column('s3ic_id', nullable=False, regexp=S3IC_ID_REGEXP, foreign_key='installations'),
+        Column('date', is_date=True),
+        Column('status', nullable=False, domain={'A', 'B'}),
+    ],
+    [RowRule('status B has a date', lambda df: (df.status == 'B') & (df.date == ''))],
+)
+
+
+def _dataframe(records):
+    return pandas.DataFrame(records, columns=['s3ic_id', 'date', 'status'])
+
+
+def test_validate_dataframe_valid():
+    dataframe = _dataframe([('0001.00001', '2020-01-01', 'A'), ('0001.00001', '', 'A')])
+    report = validate_dataframe(dataframe, _SCHEMA, {'installations': {'0001.00001'}})
+    assert report.is_valid
+    assert report.nb_rows == 2
+    report.raise_if_invalid()
+
+
+def test_validate_dataframe_reports_all_violations():
+    dataframe = _dataframe(
+        [
+            ('0001.00001', '2020-13-01', 'A'),
+            ('0001-00001', '', 'C'),
+            ('0002.00002', '', ''),
+            ('0001.00001', '', 'B'),
+        ]
+    )
+    report = validate_dataframe(dataframe, _SCHEMA, {'installations': {'0001.00001'}})
+    counts = {violation.rule: violation.nb_rows for violation in report.violations}
+    assert counts == {
+        f's3ic_id does not match {S3IC_ID_REGEXP}': 1,
+        's3ic_id is not in installations': 2,
+        'date is not a date': 1,
+        'status is empty': 1,
+        'status is not in domain': 1,
+        'status B has a date': 1,
+    }
+    with pytest.raises(ValueError):
+        report.raise_if_invalid()
+
+
+def test_validate_dataframe_missing_column():
+    report = validate_dataframe(pandas.DataFrame({'s3ic_id': ['0001.00001']}), _SCHEMA, {'installations': set()})
+    assert {violation.rule for violation in report.violations} == {
+        's3ic_id is not in installations',
+        'column date is missing',
+        'column status is missing',
+    }